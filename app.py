@@ -1,16 +1,77 @@
 import os
+import hmac
 import json
 import time
-import requests
-from flask import Flask, jsonify, render_template
+import mimetypes
+from flask import Flask, Response, g, jsonify, render_template, request, send_from_directory, stream_with_context, url_for
+from werkzeug.security import safe_join
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from collections import defaultdict
 import statistics
+from weather_cache import WeatherCache, cache_key
+from fetch_engine import FetchEngine, TokenBucket
+from snapshot import SnapshotRefresher, SnapshotStore, diff_continents
+from energy import calculate_energy_metrics_batch, energy_metrics_rows, weather_impact
+from city_registry import CityRegistry
+from http_cache import ResponseCache, available_formats, conditional_json_response, negotiate_format
+from history_store import HistoryStore, rows_to_columns
+from rollups import LEVELS, RollupTree
+from forecast import ForecastProjection
+from records import CityWeather, parse_json
+from http_client import PooledHTTPClient, CircuitOpenError, redact
+from metrics import MetricsRegistry
+from singleflight import SingleFlight
+from key_pool import KeyPool
+from assets import COMPRESSED_SUFFIXES, DIST_DIR, MANIFEST_NAME, is_current, load_manifest
 
 load_dotenv()
 app = Flask(__name__)
 
+# Shared across both weather routes and, via its SQLite tier, every worker
+weather_cache = WeatherCache.from_env(dumps=CityWeather.dumps, loads=CityWeather.loads)
+# Cities are fetched in parallel; the bucket keeps us within the provider's rate limit
+fetch_engine = FetchEngine.from_env()
+rate_limiter = TokenBucket.from_env()
+# Keep-alive pool sized to the fan-out so parallel fetches never wait for a socket
+http_client = PooledHTTPClient.from_env(pool_size=fetch_engine.concurrency)
+
+# Hot-path instrumentation, scraped from /metrics in Prometheus text format
+metrics_registry = MetricsRegistry.from_env()
+STAGE_SECONDS = metrics_registry.histogram('enerwe_stage_seconds', 'Time spent in each processing stage', ['stage'])
+UPSTREAM_SECONDS = metrics_registry.histogram('enerwe_upstream_request_seconds', 'WeatherAPI call latency', ['kind'])
+CITY_FETCH_SECONDS = metrics_registry.histogram('enerwe_city_fetch_seconds', 'Single-location WeatherAPI latency per city', ['city'])
+UPSTREAM_RESPONSES = metrics_registry.counter('enerwe_upstream_responses_total', 'WeatherAPI responses by HTTP status', ['kind', 'status'])
+UPSTREAM_ERRORS = metrics_registry.counter('enerwe_upstream_errors_total', 'Upstream fetches that produced no data', ['kind', 'reason'])
+HTTP_SECONDS = metrics_registry.histogram('enerwe_http_request_seconds', 'Time to response headers per route', ['route', 'method', 'status'])
+metrics_registry.gauge('enerwe_weather_cache_events', 'Weather cache lookups in the scraped worker', ['event'],
+              read=lambda: {(event,): value for event, value in weather_cache.stats().items()
+                            if event in ('hits', 'misses', 'shared_hits', 'size')})
+metrics_registry.gauge('enerwe_circuit_open', 'Upstream circuit breaker state in the scraped worker (0 closed, 0.5 half-open, 1 open)',
+              ['host'], read=lambda: {(host,): {'closed': 0, 'half-open': 0.5, 'open': 1}[breaker['state']]
+                                      for host, breaker in http_client.breaker_states().items()})
+
+SINGLEFLIGHT_EVENTS = metrics_registry.counter('enerwe_singleflight_total', 'Coalesced fetches by key kind and outcome',
+                                               ['kind', 'event'])
+# Concurrent misses for one city, or concurrent crawls, share one upstream call. Across workers
+# that works through the shared cache tier, so without it coalescing stays per process
+single_flight = SingleFlight.from_env(
+    cross_process=weather_cache.path is not None,
+    on_event=lambda key, event: SINGLEFLIGHT_EVENTS.inc(kind=key.split(':')[0], event=event)
+)
+
+# Point at mock_weatherapi.py (or any compatible stand-in) for offline load tests
+WEATHER_API_BASE_URL = os.getenv('WEATHER_API_BASE_URL', 'http://api.weatherapi.com/v1')
+# Every upstream call draws the least-used healthy key; usage survives restarts (see /api/admin/api-keys)
+key_pool = KeyPool.from_env()
+
+# WeatherAPI bulk requests take up to 50 locations per call
+BULK_CHUNK_SIZE = int(os.getenv('WEATHER_BULK_CHUNK_SIZE', 50))
+# WeatherAPI error codes for a key that is missing, invalid, over quota or disabled. Any other
+# 400/403 on a bulk call (e.g. 2009, no access on this plan) only rules out bulk for that key
+KEY_ERROR_CODES = (1002, 2006, 2007, 2008)
+bulk_enabled = os.getenv('WEATHER_BULK_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+
 # Major cities by continent with coordinates (expanded for better coverage)
 CITIES_BY_CONTINENT = {
     'north_america': [
@@ -75,157 +136,429 @@ CITIES_BY_CONTINENT = {
     ]
 }
 
-def get_weather_data(lat, lon, api_key):
-    """Fetch current weather and forecast data from WeatherAPI.com"""
+# Every known site (CITY_REGISTRY_PATH, or the cities above) with spatial indexes for map queries
+city_registry = CityRegistry.from_env(CITIES_BY_CONTINENT)
+MAX_SITES_PER_QUERY = 10000
+# Readable city labels for the per-city upstream latency histogram
+CITY_NAMES = {cache_key(city['lat'], city['lon']): city['name']
+              for cities in CITIES_BY_CONTINENT.values() for city in cities}
+
+def transform_weather_payload(data):
+    """Parse a WeatherAPI forecast.json payload into a CityWeather record"""
+    return CityWeather.from_weatherapi(data)
+
+def forecast_url(q, api_key):
+    """WeatherAPI forecast.json URL for a 'lat,lon' query or 'bulk'"""
+    return f"{WEATHER_API_BASE_URL}/forecast.json?key={api_key}&q={q}&days=3&aqi=no&alerts=no"
+
+def bulk_request_body(locations):
+    """Bulk POST body; custom_id maps each answer back to its cache key"""
+    return {'locations': [{'q': f"{lat},{lon}", 'custom_id': cache_key(lat, lon)} for lat, lon in locations]}
+
+def handle_forecast_response(lat, lon, status_code, read_json, elapsed):
+    """Record, validate and transform one forecast.json answer; None on any error.
+
+    Shared by the sync client and the async serving mode, which only
+    differ in how the request is sent.
+    """
+    UPSTREAM_SECONDS.observe(elapsed, kind='single')
+    CITY_FETCH_SECONDS.observe(elapsed, city=CITY_NAMES.get(cache_key(lat, lon), 'other'))
+    UPSTREAM_RESPONSES.inc(kind='single', status=status_code)
+    
     try:
-        # Current weather with forecast
-        url = f"http://api.weatherapi.com/v1/forecast.json?key={api_key}&q={lat},{lon}&days=3&aqi=no&alerts=no"
-        response = requests.get(url, timeout=10)
-        data = response.json()
+        with STAGE_SECONDS.time(stage='parse'):
+            data = read_json()
         
-        if response.status_code != 200:
-            print(f"API Error: {data}")
+        if status_code != 200:
+            print(f"API Error ({status_code}): {data}")
+            UPSTREAM_ERRORS.inc(kind='single', reason=f'http_{status_code}')
             return None
         
-        # Convert to our expected format
-        current_weather = data['current']
-        forecast_data = data['forecast']['forecastday']
-        
-        # Transform to match our processing
-        transformed_data = {
-            'current': {
-                'main': {
-                    'temp': current_weather['temp_c'],
-                    'feels_like': current_weather['feelslike_c'],
-                    'humidity': current_weather['humidity'],
-                    'pressure': current_weather['pressure_mb']
-                },
-                'weather': [{
-                    'main': current_weather['condition']['text'].split()[0],  # First word
-                    'description': current_weather['condition']['text'].lower(),
-                    'icon': current_weather['condition']['icon']
-                }],
-                'wind': {
-                    'speed': current_weather['wind_kph'] / 3.6  # Convert to m/s
-                }
-            },
-            'forecast': forecast_data
-        }
-        
+        with STAGE_SECONDS.time(stage='transform'):
+            transformed_data = transform_weather_payload(data)
+        weather_cache.set(lat, lon, transformed_data)
         return transformed_data
-    except Exception as e:
-        print(f"Error fetching weather data: {e}")
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Unexpected WeatherAPI response for {lat},{lon}: {e}")
+        UPSTREAM_ERRORS.inc(kind='single', reason='bad_payload')
         return None
 
-def calculate_energy_metrics(temp, humidity, wind_speed):
-    """Calculate estimated energy consumption metrics based on weather"""
-    # Simplified energy consumption estimation
-    # Heating degree days (HDD) and Cooling degree days (CDD)
-    base_temp = 18  # Base temperature in Celsius
+def upstream_error_code(read_json):
+    """WeatherAPI's numeric error code from an error answer, or None"""
+    try:
+        return read_json()['error']['code']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def bulk_available():
+    return bulk_enabled and key_pool.bulk_available()
+
+def handle_bulk_response(api_key, status_code, read_json, elapsed):
+    """Record and transform one bulk answer: {cache_key: transformed_data}, or None if the call failed"""
+    UPSTREAM_SECONDS.observe(elapsed, kind='bulk')
+    UPSTREAM_RESPONSES.inc(kind='bulk', status=status_code)
     
-    if temp < base_temp:
-        heating_demand = (base_temp - temp) * 1.5  # Heating multiplier
-        cooling_demand = 0
-    else:
-        heating_demand = 0
-        cooling_demand = (temp - base_temp) * 1.2  # Cooling multiplier
+    if status_code in (400, 401, 403):
+        UPSTREAM_ERRORS.inc(kind='bulk', reason=f'http_{status_code}')
+        if status_code == 401 or upstream_error_code(read_json) in KEY_ERROR_CODES:
+            key_pool.report(api_key, status_code)
+        else:
+            # Bulk requests need a paid plan; keep this key for single-location fetches
+            key_pool.disable_bulk(api_key)
+        return None
+    key_pool.report(api_key, status_code)
+    if status_code != 200:
+        print(f"Bulk API Error ({status_code})")
+        UPSTREAM_ERRORS.inc(kind='bulk', reason=f'http_{status_code}')
+        return None
+    
+    fetched = {}
+    try:
+        with STAGE_SECONDS.time(stage='parse'):
+            entries = read_json()['bulk']
+        with STAGE_SECONDS.time(stage='transform'):
+            for entry in entries:
+                query = entry['query']
+                if 'current' not in query:
+                    UPSTREAM_ERRORS.inc(kind='bulk', reason='location_error')
+                    continue  # Per-location error; that city falls back to a single fetch
+                fetched[query['custom_id']] = transform_weather_payload(query)
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Unexpected bulk response: {e}")
+        UPSTREAM_ERRORS.inc(kind='bulk', reason='bad_payload')
+        return None
+    return fetched
+
+def get_weather_data(lat, lon):
+    """Fetch current weather and forecast data from WeatherAPI.com"""
+    cached = weather_cache.get(lat, lon)
+    if cached is not None:
+        return cached
+    return single_flight.do(f"city:{cache_key(lat, lon)}", lambda: fetch_weather_data(lat, lon),
+                            recheck=lambda: weather_cache.get(lat, lon))
+
+def fetch_weather_data(lat, lon):
+    """One uncached forecast.json call; use get_weather_data, which coalesces concurrent callers"""
+    import requests  # Deferred with the HTTP session, see PooledHTTPClient._build_session
     
-    # Factor in humidity and wind
-    humidity_factor = 1 + (humidity - 50) / 100  # Higher humidity increases energy needs
-    wind_factor = max(0.8, 1 - wind_speed / 50)  # Wind reduces energy needs slightly
+    # Waiting longer than the fan-out deadline for a token is pointless
+    with STAGE_SECONDS.time(stage='rate_limit_wait'):
+        acquired = rate_limiter.acquire(timeout=fetch_engine.deadline)
+    if not acquired:
+        print(f"Rate limit wait exceeded for {lat},{lon}")
+        UPSTREAM_ERRORS.inc(kind='single', reason='rate_limited')
+        return None
+    api_key = key_pool.acquire()
+    if api_key is None:
+        print(f"No API key with budget left for {lat},{lon}")
+        UPSTREAM_ERRORS.inc(kind='single', reason='no_api_key')
+        return None
+
+    # Current weather with forecast
+    started = time.perf_counter()
+    try:
+        response = http_client.get(forecast_url(f"{lat},{lon}", api_key))
+    except CircuitOpenError as e:
+        print(f"Skipping {lat},{lon}: {e}")
+        UPSTREAM_ERRORS.inc(kind='single', reason='circuit_open')
+        key_pool.refund(api_key)
+        return None
+    except requests.RequestException as e:
+        print(f"Upstream request failed for {lat},{lon}: {redact(e)}")
+        UPSTREAM_ERRORS.inc(kind='single', reason='exception')
+        key_pool.refund(api_key)
+        return None
+    key_pool.report(api_key, response.status_code)
+    return handle_forecast_response(lat, lon, response.status_code, lambda: parse_json(response.content),
+                                    time.perf_counter() - started)
+
+def get_weather_data_chunk(locations):
+    """Fetch up to one chunk of (lat, lon) locations in a single WeatherAPI bulk call.
+
+    Returns {cache_key: transformed_data} for the locations the bulk answer
+    covered, or None when the bulk call itself failed.
+    """
+    import requests  # Deferred with the HTTP session, see PooledHTTPClient._build_session
     
-    total_energy_index = (heating_demand + cooling_demand) * humidity_factor * wind_factor
+    with STAGE_SECONDS.time(stage='rate_limit_wait'):
+        acquired = rate_limiter.acquire(timeout=fetch_engine.deadline)
+    if not acquired:
+        print(f"Rate limit wait exceeded for bulk chunk of {len(locations)}")
+        UPSTREAM_ERRORS.inc(kind='bulk', reason='rate_limited')
+        return None
+    # WeatherAPI counts each location of a bulk call as one call
+    api_key = key_pool.acquire(len(locations), bulk=True)
+    if api_key is None:
+        print(f"No bulk-capable API key with budget left for chunk of {len(locations)}")
+        UPSTREAM_ERRORS.inc(kind='bulk', reason='no_api_key')
+        return None
     
-    return {
-        'heating_demand': round(heating_demand, 2),
-        'cooling_demand': round(cooling_demand, 2),
-        'total_energy_index': round(total_energy_index, 2),
-        'efficiency_rating': 'High' if total_energy_index < 10 else 'Medium' if total_energy_index < 20 else 'Low'
-    }
+    started = time.perf_counter()
+    try:
+        response = http_client.request('POST', forecast_url('bulk', api_key), json=bulk_request_body(locations))
+    except CircuitOpenError as e:
+        print(f"Skipping bulk chunk: {e}")
+        UPSTREAM_ERRORS.inc(kind='bulk', reason='circuit_open')
+        key_pool.refund(api_key, len(locations))
+        return None
+    except requests.RequestException as e:
+        print(f"Bulk request failed: {redact(e)}")
+        UPSTREAM_ERRORS.inc(kind='bulk', reason='exception')
+        key_pool.refund(api_key, len(locations))
+        return None
+    return handle_bulk_response(api_key, response.status_code, lambda: parse_json(response.content), time.perf_counter() - started)
 
-@app.route('/')
-def index():
-    """Serve the main dashboard page"""
-    return render_template('index.html')
+def get_weather_data_batch(locations):
+    """Fetch many (lat, lon) locations, preferring bulk calls.
 
-@app.route('/api/weather-energy-by-continent')
-def weather_energy_by_continent():
-    """Get weather and energy analysis data for all continents"""
-    api_key = os.getenv('WEATHER_API_KEY')
+    Cache hits are served directly, misses are grouped into bulk calls of
+    WEATHER_BULK_CHUNK_SIZE locations, and anything a bulk call did not
+    return is fetched with get_weather_data. Returns [(data, error)] in
+    input order, with the same error markers as FetchEngine.fetch_all.
+    """
+    started = time.monotonic()
+    coords = {cache_key(lat, lon): (lat, lon) for lat, lon in locations}
+    found = {}
+    errors = {}
+    missing = []
+    for key, (lat, lon) in coords.items():
+        cached = weather_cache.get(lat, lon)
+        if cached is not None:
+            found[key] = cached
+        else:
+            missing.append(key)
     
-    if not api_key:
-        return jsonify({"error": "WeatherAPI key not found. Please add WEATHER_API_KEY to your .env file"}), 500
+    if missing and bulk_available():
+        chunks = [missing[i:i + BULK_CHUNK_SIZE] for i in range(0, len(missing), BULK_CHUNK_SIZE)]
+        results = fetch_engine.fetch_all(
+            chunks, lambda chunk: get_weather_data_chunk([coords[key] for key in chunk])
+        )
+        for chunk, fetched, error in results:
+            for key, data in (fetched or {}).items():
+                weather_cache.set(*coords[key], data)
+                found[key] = data
     
-    continent_data = {}
+    # Single-location fallback for whatever the bulk path did not deliver
+    remaining = [key for key in missing if key not in found]
+    if remaining:
+        deadline = max(0, fetch_engine.deadline - (time.monotonic() - started))
+        results = fetch_engine.fetch_all(
+            remaining, lambda key: get_weather_data(*coords[key]), deadline=deadline
+        )
+        for key, data, error in results:
+            if data is not None:
+                found[key] = data
+            else:
+                errors[key] = error
     
-    for continent, cities in CITIES_BY_CONTINENT.items():
-        continent_data[continent] = {
-            'cities': [],
-            'avg_temp': 0,
-            'avg_energy_index': 0,
-            'weather_summary': {}
+    results = []
+    for lat, lon in locations:
+        key = cache_key(lat, lon)
+        results.append((found[key], None) if key in found else (None, errors.get(key, 'unavailable')))
+    return results
+
+# The snapshot crawl's fetcher; the async serving mode (asgi.py) swaps in its own
+fetch_weather_batch = get_weather_data_batch
+
+def calculate_energy_metrics(temp, humidity, wind_speed):
+    """Calculate estimated energy consumption metrics based on weather"""
+    # Thin wrapper over the vectorised engine so single and batch results always agree
+    metrics = calculate_energy_metrics_batch([temp], [humidity], [wind_speed])
+    return energy_metrics_rows(metrics)[0]
+
+@app.before_request
+def start_request_timer():
+    metrics_registry.start()
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    # Streamed bodies keep flowing after this; their timing ends at the headers
+    started = g.pop('request_started', None)
+    if started is not None:
+        HTTP_SECONDS.observe(
+            time.perf_counter() - started,
+            route=request.url_rule.rule if request.url_rule else 'unmatched',
+            method=request.method,
+            status=response.status_code
+        )
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Expose counters and latency histograms in Prometheus text format"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+# Built by `python assets.py`; without a build, templates link the plain static files
+asset_manifest = load_manifest(app.static_folder)
+ASSET_MAX_AGE = 365 * 24 * 3600
+built_assets = {entry['path']: entry for entry in asset_manifest.values()}
+# Source name -> ((mtime, size), whether the build still matches), so sources are only rehashed after a change
+asset_checks = {}
+
+def current_build(name):
+    """Manifest entry for a static source, or None if it wasn't built or was edited since"""
+    entry = asset_manifest.get(name)
+    if entry is None:
+        return None
+    try:
+        stat = os.stat(os.path.join(app.static_folder, name))
+    except OSError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    checked = asset_checks.get(name)
+    if checked is None or checked[0] != signature:
+        current = is_current(app.static_folder, name, entry)
+        if not current:
+            print(f"static/{name} changed since its build, serving it unbuilt until `python assets.py` runs again")
+        checked = asset_checks[name] = (signature, current)
+    return entry if checked[1] else None
+
+def asset_links():
+    """Which file each built source links to right now, so a cached page is redrawn when that changes"""
+    links = []
+    for name in asset_manifest:
+        entry = current_build(name)
+        links.append(entry['path'] if entry is not None else name)
+    return tuple(links)
+
+@app.context_processor
+def fingerprinted_url_for():
+    """url_for in templates, resolving static files to their hashed build output"""
+    def asset_url_for(endpoint, **values):
+        entry = current_build(values.get('filename')) if endpoint == 'static' else None
+        if entry is not None:
+            return url_for('built_asset', filename=entry['path'])
+        return url_for(endpoint, **values)
+    return {'url_for': asset_url_for}
+
+@app.route(f'/static/{DIST_DIR}/<path:filename>')
+def built_asset(filename):
+    """Serve a hashed build output, precompressed when the client accepts it; its name changes with its content"""
+    dist_dir = os.path.join(app.static_folder, DIST_DIR)
+    entry = built_assets.get(filename)
+    if entry is None:
+        # Output of an earlier build, still linked from pages rendered before the last one
+        path = safe_join(dist_dir, filename)
+        if (path is None or filename == MANIFEST_NAME or filename.endswith(tuple(COMPRESSED_SUFFIXES.values()))
+                or not os.path.isfile(path)):
+            return jsonify({"error": "Unknown asset"}), 404
+        entry = {'encodings': [encoding for encoding, suffix in COMPRESSED_SUFFIXES.items()
+                               if os.path.isfile(path + suffix)]}
+    encoding = next((encoding for encoding in ('br', 'gzip')
+                     if encoding in entry['encodings'] and request.accept_encodings[encoding]), None)
+    response = send_from_directory(
+        dist_dir, filename + COMPRESSED_SUFFIXES.get(encoding, ''),
+        mimetype=mimetypes.guess_type(filename)[0], max_age=ASSET_MAX_AGE
+    )
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Last-Modified of the dashboard page before any snapshot exists
+APP_LOADED_AT = time.time()
+
+def render_index(snapshot):
+    """The dashboard page with the overview, summary and map boundaries inlined for first paint"""
+    initial_data = None
+    if snapshot is not None:
+        with app.open_resource('static/continents.geo.json') as f:
+            geojson = json.load(f)
+        initial_data = {
+            'version': snapshot.digest,
+            'generated_at': datetime.fromtimestamp(snapshot.generated_at, timezone.utc).isoformat(),
+            'restored': snapshot.restored,
+            'continents': snapshot.continents,
+            'summary': build_global_summary(snapshot.continents),
+            'geojson': geojson
         }
-        
-        temps = []
-        energy_indices = []
-        weather_conditions = defaultdict(int)
-        
-        for city in cities:
-            weather_data = get_weather_data(city['lat'], city['lon'], api_key)
-            
-            if weather_data and 'main' in weather_data['current']:
-                current = weather_data['current']
-                temp = current['main']['temp']
-                humidity = current['main']['humidity']
-                wind_speed = current.get('wind', {}).get('speed', 0)
-                
-                energy_metrics = calculate_energy_metrics(temp, humidity, wind_speed)
-                
-                city_info = {
-                    'name': city['name'],
-                    'country': city['country'],
-                    'temperature': round(temp, 1),
-                    'humidity': humidity,
-                    'wind_speed': round(wind_speed, 1),
-                    'weather': current['weather'][0]['description'],
-                    'energy_metrics': energy_metrics
-                }
-                
-                continent_data[continent]['cities'].append(city_info)
-                temps.append(temp)
-                energy_indices.append(energy_metrics['total_energy_index'])
-                weather_conditions[current['weather'][0]['main']] += 1
-                
-                # Add small delay to respect API rate limits
-                time.sleep(0.1)
-        
-        # Calculate continent averages
-        if temps:
-            continent_data[continent]['avg_temp'] = round(statistics.mean(temps), 1)
-            continent_data[continent]['avg_energy_index'] = round(statistics.mean(energy_indices), 1)
-            continent_data[continent]['weather_summary'] = dict(weather_conditions)
-            
-            # Add trend analysis
-            temp_range = max(temps) - min(temps)
-            continent_data[continent]['temp_variability'] = 'High' if temp_range > 15 else 'Medium' if temp_range > 8 else 'Low'
+    return render_template('index.html', initial_data=initial_data)
+
+@app.route('/')
+def index():
+    """Serve the main dashboard page"""
+    # Never hold the page for the first crawl; without a snapshot the client streams as before
+    snapshot = snapshot_refresher.current(wait=False) if key_pool else None
+    if snapshot is None:
+        encoded = response_cache.get('page', (None, asset_links()), APP_LOADED_AT, lambda: render_index(None), 'html')
+        return conditional_json_response(encoded)
     
-    return jsonify(continent_data)
+    # Rendered once per snapshot (and asset build), then served with ETags like the API
+    encoded = response_cache.get('page', (snapshot.version, asset_links()), snapshot.generated_at,
+                                 lambda: render_index(snapshot), 'html')
+    return conditional_json_response(encoded, snapshot.headers(snapshot_refresher.stale_after))
 
-@app.route('/api/continent-details/<continent>')
-def continent_details(continent):
-    """Get detailed analysis for a specific continent"""
-    api_key = os.getenv('WEATHER_API_KEY')
+def build_city_info(city, weather_data, energy_metrics):
+    """Overview entry for one city, as listed under a continent's 'cities'"""
+    current = weather_data.current
+    return {
+        'name': city['name'],
+        'country': city['country'],
+        'temperature': round(current.temp, 1),
+        'humidity': current.humidity,
+        'wind_speed': round(current.wind_speed, 1),
+        'weather': current.description,
+        'energy_metrics': energy_metrics
+    }
+
+def temp_variability(temp_range):
+    """Classify the spread between a continent's warmest and coldest city"""
+    return 'High' if temp_range > 15 else 'Medium' if temp_range > 8 else 'Low'
+
+def rollup_aggregates(rollup):
+    """Continent-style averages, condition counts and variability read from a rollup node"""
+    if not rollup:
+        return {'avg_temp': 0, 'avg_energy_index': 0, 'weather_summary': {}}
+    return {
+        'avg_temp': round(rollup['temp']['mean'], 1),
+        'avg_energy_index': round(rollup['energy_index']['mean'], 1),
+        'weather_summary': rollup['conditions'],
+        'temp_variability': temp_variability(rollup['temp']['max'] - rollup['temp']['min'])
+    }
+
+def summarize_continent(results, rollup):
+    """Build the continent overview from (city, weather, error, energy_metrics) results and its rollup"""
+    continent_summary = {
+        'cities': [],
+        'failed_cities': []
+    }
     
-    if not api_key:
-        return jsonify({"error": "WeatherAPI key not found"}), 500
+    for city, weather_data, error, energy_metrics in results:
+        if energy_metrics is not None:
+            continent_summary['cities'].append(build_city_info(city, weather_data, energy_metrics))
+        else:
+            continent_summary['failed_cities'].append({
+                'name': city['name'],
+                'country': city['country'],
+                'error': error or 'unavailable'
+            })
     
-    if continent not in CITIES_BY_CONTINENT:
-        return jsonify({"error": "Continent not found"}), 404
+    # Averages come from the running aggregates rather than a rescan
+    continent_summary.update(rollup_aggregates(rollup))
     
-    cities = CITIES_BY_CONTINENT[continent]
+    return continent_summary
+
+def update_rollup(tree, continent, city, weather_data, energy_metrics):
+    """Swap one city's observation into the rollups, or drop it when its fetch failed"""
+    city_key = (city['country'], city['name'])
+    if energy_metrics is None:
+        tree.discard(city_key)
+        return
+    current = weather_data.current
+    tree.update(
+        city_key, city['country'], continent,
+        current.temp, energy_metrics['total_energy_index'], current.humidity, current.weather_main
+    )
+
+def detail_continent(continent, results):
+    """Build the per-city detailed analysis for one continent from scored fetch results"""
     detailed_data = {
         'continent': continent,
         'cities': [],
+        'failed_cities': [],
         'analysis': {
             'energy_efficiency_ranking': [],
             'temperature_correlation': {},
@@ -233,37 +566,25 @@ def continent_details(continent):
         }
     }
     
-    for city in cities:
-        weather_data = get_weather_data(city['lat'], city['lon'], api_key)
-        
-        if weather_data and 'main' in weather_data['current']:
-            current = weather_data['current']
-            forecast = weather_data.get('forecast', [])
-            
-            temp = current['main']['temp']
-            humidity = current['main']['humidity']
-            wind_speed = current.get('wind', {}).get('speed', 0)
-            
-            energy_metrics = calculate_energy_metrics(temp, humidity, wind_speed)
+    for city, weather_data, error, energy_metrics in results:
+        if energy_metrics is not None:
+            current = weather_data.current
+            temp = current.temp
             
-            # Process forecast data for trends
-            forecast_temps = []
-            if forecast:
-                for day in forecast[:2]:  # Next 2 days
-                    if 'day' in day:
-                        forecast_temps.append(day['day']['avgtemp_c'])
+            # Next 2 days for the trend
+            forecast_temps = [day.avg_temp for day in weather_data.forecast[:2]]
             
             city_detail = {
                 'name': city['name'],
                 'country': city['country'],
                 'current_weather': {
                     'temperature': round(temp, 1),
-                    'feels_like': round(current['main']['feels_like'], 1),
-                    'humidity': humidity,
-                    'pressure': current['main']['pressure'],
-                    'wind_speed': round(wind_speed, 1),
-                    'description': current['weather'][0]['description'],
-                    'icon': current['weather'][0]['icon']
+                    'feels_like': round(current.feels_like, 1),
+                    'humidity': current.humidity,
+                    'pressure': current.pressure,
+                    'wind_speed': round(current.wind_speed, 1),
+                    'description': current.description,
+                    'icon': current.icon
                 },
                 'energy_analysis': energy_metrics,
                 'forecast_trend': {
@@ -277,28 +598,516 @@ def continent_details(continent):
                 'city': city['name'],
                 'efficiency_score': energy_metrics['total_energy_index']
             })
-            
-            time.sleep(0.1)
+        else:
+            detailed_data['failed_cities'].append({
+                'name': city['name'],
+                'country': city['country'],
+                'error': error or 'unavailable'
+            })
     
     # Sort cities by energy efficiency
     detailed_data['analysis']['energy_efficiency_ranking'].sort(key=lambda x: x['efficiency_score'])
     
-    return jsonify(detailed_data)
+    return detailed_data
 
-@app.route('/api/global-energy-summary')
-def global_energy_summary():
-    """Get global energy consumption patterns summary"""
-    # This would typically connect to real energy APIs like EIA
-    # For now, we'll provide simulated comparative data
-    
-    summary = {
-        'global_trends': {
-            'avg_energy_efficiency': 15.2,
-            'most_efficient_continent': 'Europe',
-            'highest_consumption_continent': 'North America',
-            'renewable_energy_leaders': ['Europe', 'Oceania'],
-            'weather_impact_factor': 0.73  # How much weather affects energy consumption
-        },
+def record_history(all_cities, results, observed, metrics, carried=()):
+    """Append this crawl's observations to the on-disk history, skipping cities carried forward"""
+    now = time.time()
+    observations = []
+    for position, i in enumerate(observed):
+        continent, city = all_cities[i]
+        if city['name'] in carried:
+            continue
+        current = results[i][0].current
+        observations.append({
+            'name': city['name'],
+            'country': city['country'],
+            'continent': continent,
+            'ts': current.observed_at or now,
+            'temp': current.temp,
+            'humidity': current.humidity,
+            'wind_speed': current.wind_speed,
+            'heating_demand': metrics['heating_demand'][position],
+            'cooling_demand': metrics['cooling_demand'][position],
+            'total_energy_index': metrics['total_energy_index'][position]
+        })
+    try:
+        history_store.record(observations)
+    except OSError as e:
+        print(f"History write failed: {e}")
+
+def build_snapshot_data():
+    """Crawl every city once and derive the overview, per-continent details and hourly projections"""
+    if not key_pool:
+        return None
+    started = time.perf_counter()
+    
+    # Fetch every city of every continent in as few upstream calls as possible
+    all_cities = [(continent, city) for continent, cities in CITIES_BY_CONTINENT.items() for city in cities]
+    locations = [(city['lat'], city['lon']) for _, city in all_cities]
+    with STAGE_SECONDS.time(stage='fetch'):
+        # Workers starting together crawl one at a time; the later ones find every city in the shared cache.
+        # Copied, since concurrent callers in this process share the result and it is patched below
+        results = list(single_flight.do('crawl', lambda: fetch_weather_batch(locations)))
+    
+    # An outage must not replace a good snapshot with an empty one
+    fresh = sum(1 for weather_data, _ in results if weather_data is not None)
+    if fresh < max(1, SNAPSHOT_MIN_FRESH * len(results)):
+        raise RuntimeError(f"only {fresh} of {len(results)} cities fetched, keeping the previous snapshot")
+    
+    # Cities that failed this time keep their last good observation; the snapshot is then marked stale
+    carried = []
+    for i, ((continent, city), (weather_data, error)) in enumerate(zip(all_cities, results)):
+        key = cache_key(city['lat'], city['lon'])
+        if weather_data is not None:
+            last_known_weather[key] = weather_data
+        elif key in last_known_weather:
+            results[i] = (last_known_weather[key], None)
+            carried.append(city['name'])
+    
+    # Score every city that came back in one vectorised pass
+    with STAGE_SECONDS.time(stage='energy_metrics'):
+        observed = [i for i, (weather_data, _) in enumerate(results) if weather_data is not None]
+        currents = [results[i][0].current for i in observed]
+        metrics = calculate_energy_metrics_batch(
+            [current.temp for current in currents],
+            [current.humidity for current in currents],
+            [current.wind_speed for current in currents]
+        )
+        metrics_by_index = dict(zip(observed, energy_metrics_rows(metrics)))
+    
+    if history_store is not None:
+        with STAGE_SECONDS.time(stage='history'):
+            record_history(all_cities, results, observed, metrics, set(carried))
+    
+    with STAGE_SECONDS.time(stage='summarize'):
+        results_by_continent = defaultdict(list)
+        for i, ((continent, city), (weather_data, error)) in enumerate(zip(all_cities, results)):
+            results_by_continent[continent].append((city, weather_data, error, metrics_by_index.get(i)))
+            update_rollup(rollups, continent, city, weather_data, metrics_by_index.get(i))
+        
+        continents = {}
+        details = {}
+        for continent in CITIES_BY_CONTINENT:
+            continents[continent] = summarize_continent(results_by_continent[continent],
+                                                        rollups.summary('continent', continent))
+            details[continent] = detail_continent(continent, results_by_continent[continent])
+    
+    # Hourly demand for every city and forecast hour in one batched pass
+    with STAGE_SECONDS.time(stage='forecast'):
+        forecast = ForecastProjection.from_hourly([
+            ({'name': city['name'], 'country': city['country'], 'continent': continent},
+             weather_data.hourly if weather_data else None)
+            for (continent, city), (weather_data, _) in zip(all_cities, results)
+        ])
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage='snapshot_build')
+    return continents, details, forecast, carried
+
+# Share of cities a crawl must fetch for its snapshot to replace the previous one
+SNAPSHOT_MIN_FRESH = float(os.getenv('SNAPSHOT_MIN_FRESH', 0.5))
+# Last good observation per city (cache key), shown while that city's fetches fail
+last_known_weather = {}
+
+# Country/continent/global aggregates, updated city by city as observations land
+rollups = RollupTree()
+
+# Every crawl is appended here so trends survive past the request
+history_store = HistoryStore.from_env()
+
+# Routes only read the latest snapshot; the upstream crawl runs in the background.
+# The last one is kept on disk so a restarted worker answers at once, marked stale
+snapshot_store = SnapshotStore.from_env(encode_forecast=ForecastProjection.to_state,
+                                        decode_forecast=ForecastProjection.from_state)
+snapshot_refresher = SnapshotRefresher.from_env(build_snapshot_data, store=snapshot_store)
+# Serialized and compressed once per snapshot, then served with ETags
+response_cache = ResponseCache(timer=lambda stage: STAGE_SECONDS.time(stage=stage))
+# City-list routes also offer columnar JSON and MessagePack (see compact.py)
+FORMAT_HEADERS = {'Vary': 'Accept, Accept-Encoding'}
+
+@app.route('/api/weather-energy-by-continent')
+def weather_energy_by_continent():
+    """Get weather and energy analysis data for all continents"""
+    if not key_pool:
+        return jsonify({"error": "WeatherAPI key not found. Please add WEATHER_API_KEYS (or WEATHER_API_KEY) to your .env file"}), 500
+    
+    snapshot = snapshot_refresher.current()
+    if snapshot is None:
+        return jsonify({"error": "Weather data is still loading, please retry shortly"}), 503
+    
+    fmt = negotiate_format()
+    if fmt is None:
+        return jsonify({"error": f"Unsupported format, use one of: {', '.join(available_formats())}"}), 406
+    
+    encoded = response_cache.get('continents', snapshot.version, snapshot.generated_at,
+                                 lambda: snapshot.continents, fmt)
+    return conditional_json_response(encoded, dict(snapshot.headers(snapshot_refresher.stale_after), **FORMAT_HEADERS))
+
+@app.route('/api/weather-energy-by-continent/delta')
+def weather_energy_delta():
+    """Changes to the continent overview since the client's snapshot version.
+
+    `since` is the X-Snapshot-Version the client last applied. Answers with
+    only the changed cities and aggregates, or with the whole overview and
+    `full: true` when `since` is missing or no longer in the history.
+    """
+    if not key_pool:
+        return jsonify({"error": "WeatherAPI key not found. Please add WEATHER_API_KEYS (or WEATHER_API_KEY) to your .env file"}), 500
+    
+    snapshot = snapshot_refresher.current()
+    if snapshot is None:
+        return jsonify({"error": "Weather data is still loading, please retry shortly"}), 503
+    
+    since = request.args.get('since')
+    base = snapshot_refresher.find(since) if since else None
+    if base is None:
+        key = 'delta:full'
+        build_payload = lambda: {'version': snapshot.digest, 'full': True, 'continents': snapshot.continents}
+    else:
+        key = f'delta:{since}'
+        build_payload = lambda: {
+            'version': snapshot.digest,
+            'since': since,
+            'full': False,
+            'continents': diff_continents(base.continents, snapshot.continents)
+        }
+    
+    encoded = response_cache.get(key, snapshot.version, snapshot.generated_at, build_payload)
+    return conditional_json_response(encoded, snapshot.headers(snapshot_refresher.stale_after))
+
+class ContinentStream:
+    """NDJSON lines for cities arriving in completion order.
+
+    Shared by the sync route and the async serving mode: feed each
+    fetched (or failed) city to `city()`, then finish with `done()`.
+    """
+    
+    def __init__(self):
+        self.remaining = {continent: len(cities) for continent, cities in CITIES_BY_CONTINENT.items()}
+        self.failed = defaultdict(int)
+        # Per-request tree: streamed cities never touch the snapshot's rollups
+        self.tree = RollupTree()
+    
+    def city(self, continent, city, weather_data, error):
+        """The city's record, plus its continent's aggregate once that continent is complete"""
+        energy_metrics = None
+        if weather_data is not None:
+            current = weather_data.current
+            with STAGE_SECONDS.time(stage='energy_metrics'):
+                energy_metrics = calculate_energy_metrics(current.temp, current.humidity, current.wind_speed)
+            record = {'type': 'city', 'continent': continent,
+                      'city': build_city_info(city, weather_data, energy_metrics)}
+        else:
+            self.failed[continent] += 1
+            record = {'type': 'failed', 'continent': continent,
+                      'city': {'name': city['name'], 'country': city['country'], 'error': error or 'unavailable'}}
+        update_rollup(self.tree, continent, city, weather_data, energy_metrics)
+        lines = [json.dumps(record) + '\n']
+        
+        self.remaining[continent] -= 1
+        if self.remaining[continent] == 0:
+            summary = rollup_aggregates(self.tree.summary('continent', continent))
+            summary['failed'] = self.failed[continent]
+            lines.append(json.dumps({'type': 'continent', 'continent': continent, 'summary': summary}) + '\n')
+        return lines
+    
+    def done(self):
+        return json.dumps({'type': 'done', 'generated_at': datetime.now(timezone.utc).isoformat()}) + '\n'
+
+# Keep reverse proxies from buffering the stream into one response
+STREAM_HEADERS = {'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'}
+
+@app.route('/api/weather-energy-by-continent/stream')
+def weather_energy_stream():
+    """Stream city records as NDJSON as soon as each is fetched and scored.
+
+    Emits {"type": "city"} or {"type": "failed"} per city, a
+    {"type": "continent"} aggregate once all of a continent's cities are in,
+    and a final {"type": "done"}. Continent aggregates come from a running
+    rollup updated per city, so nothing is rescanned as cities arrive.
+    """
+    if not key_pool:
+        return jsonify({"error": "WeatherAPI key not found. Please add WEATHER_API_KEYS (or WEATHER_API_KEY) to your .env file"}), 500
+    
+    all_cities = [(continent, city) for continent, cities in CITIES_BY_CONTINENT.items() for city in cities]
+    
+    def generate():
+        stream = ContinentStream()
+        completed = fetch_engine.iter_completed(
+            all_cities, lambda entry: get_weather_data(entry[1]['lat'], entry[1]['lon'])
+        )
+        for (continent, city), weather_data, error in completed:
+            yield from stream.city(continent, city, weather_data, error)
+        yield stream.done()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers=STREAM_HEADERS)
+
+@app.route('/api/continent-details/<continent>')
+def continent_details(continent):
+    """Get detailed analysis for a specific continent"""
+    if not key_pool:
+        return jsonify({"error": "WeatherAPI key not found"}), 500
+    
+    if continent not in CITIES_BY_CONTINENT:
+        return jsonify({"error": "Continent not found"}), 404
+    
+    snapshot = snapshot_refresher.current()
+    if snapshot is None:
+        return jsonify({"error": "Weather data is still loading, please retry shortly"}), 503
+    
+    fmt = negotiate_format()
+    if fmt is None:
+        return jsonify({"error": f"Unsupported format, use one of: {', '.join(available_formats())}"}), 406
+    
+    encoded = response_cache.get(f'details:{continent}', snapshot.version, snapshot.generated_at,
+                                 lambda: snapshot.details[continent], fmt)
+    return conditional_json_response(encoded, dict(snapshot.headers(snapshot_refresher.stale_after), **FORMAT_HEADERS))
+
+@app.route('/api/forecast/city')
+def city_forecast():
+    """Hourly forecast and projected energy demand for one city"""
+    if not key_pool:
+        return jsonify({"error": "WeatherAPI key not found. Please add WEATHER_API_KEYS (or WEATHER_API_KEY) to your .env file"}), 500
+    
+    name = request.args.get('name')
+    if not name:
+        return jsonify({"error": "name query parameter is required"}), 400
+    
+    snapshot = snapshot_refresher.current()
+    if snapshot is None:
+        return jsonify({"error": "Weather data is still loading, please retry shortly"}), 503
+    
+    country = request.args.get('country')
+    row = snapshot.forecast.find(name, country)
+    if row is None:
+        return jsonify({"error": "City not found"}), 404
+    
+    site = snapshot.forecast.sites[row]
+    encoded = response_cache.get(f"forecast:{site['country']}:{site['name']}", snapshot.version, snapshot.generated_at,
+                                 lambda: dict(site, hours=snapshot.forecast.city_curve(row)))
+    return conditional_json_response(encoded, snapshot.headers(snapshot_refresher.stale_after))
+
+@app.route('/api/forecast/continent/<continent>')
+def continent_forecast(continent):
+    """Hourly mean temperature and projected energy demand across a continent's cities"""
+    if not key_pool:
+        return jsonify({"error": "WeatherAPI key not found. Please add WEATHER_API_KEYS (or WEATHER_API_KEY) to your .env file"}), 500
+    
+    if continent not in CITIES_BY_CONTINENT:
+        return jsonify({"error": "Continent not found"}), 404
+    
+    snapshot = snapshot_refresher.current()
+    if snapshot is None:
+        return jsonify({"error": "Weather data is still loading, please retry shortly"}), 503
+    
+    encoded = response_cache.get(f'forecast:{continent}', snapshot.version, snapshot.generated_at,
+                                 lambda: {'continent': continent, 'hours': snapshot.forecast.continent_curve(continent)})
+    return conditional_json_response(encoded, snapshot.headers(snapshot_refresher.stale_after))
+
+def site_payload(indices, distances=None):
+    """Serialize registry sites, optionally with their distance to the query point"""
+    sites = []
+    for position, index in enumerate(indices):
+        site = dict(city_registry.sites[index])
+        if distances is not None:
+            site['distance_km'] = round(distances[position], 2)
+        sites.append(site)
+    return sites
+
+@app.route('/api/sites')
+def list_sites():
+    """List registered sites for a continent and/or country"""
+    indices = city_registry.select(request.args.get('continent'), request.args.get('country'))
+    limit = min(request.args.get('limit', 1000, type=int), MAX_SITES_PER_QUERY)
+    return jsonify({
+        'count': len(indices),
+        'truncated': len(indices) > limit,
+        'sites': site_payload(indices[:limit].tolist())
+    })
+
+@app.route('/api/sites/nearest')
+def nearest_sites():
+    """Find the N sites closest to a point"""
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None or not -90 <= lat <= 90:
+        return jsonify({"error": "lat (-90..90) and lon query parameters are required"}), 400
+    
+    n = max(1, min(request.args.get('n', 10, type=int), MAX_SITES_PER_QUERY))
+    matches = city_registry.nearest(
+        lat, lon, n, continent=request.args.get('continent'), country=request.args.get('country')
+    )
+    return jsonify({
+        'count': len(matches),
+        'sites': site_payload([index for index, _ in matches], [distance for _, distance in matches])
+    })
+
+@app.route('/api/sites/bbox')
+def sites_in_bbox():
+    """Find all sites inside a south/west/north/east bounding box"""
+    bounds = [request.args.get(name, type=float) for name in ('south', 'west', 'north', 'east')]
+    if None in bounds or bounds[0] > bounds[2]:
+        return jsonify({"error": "south, west, north and east query parameters are required"}), 400
+    
+    indices = city_registry.in_bbox(
+        *bounds, continent=request.args.get('continent'), country=request.args.get('country')
+    )
+    limit = min(request.args.get('limit', 2000, type=int), MAX_SITES_PER_QUERY)
+    return jsonify({
+        'count': len(indices),
+        'truncated': len(indices) > limit,
+        'sites': site_payload(indices[:limit].tolist())
+    })
+
+def parse_time(value, default):
+    """Accept epoch seconds or an ISO 8601 timestamp from a query parameter"""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        moment = datetime.fromisoformat(value)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+
+@app.route('/api/history')
+def observation_history():
+    """Observation and energy history for a city, country or continent"""
+    if history_store is None:
+        return jsonify({"error": "History is disabled (HISTORY_DIR is empty)"}), 404
+    
+    city = request.args.get('city')
+    country = request.args.get('country')
+    continent = request.args.get('continent')
+    if not (city or country or continent):
+        return jsonify({"error": "Pass at least one of city, country or continent"}), 400
+    
+    resolution = request.args.get('resolution', 'auto')
+    if resolution not in ('auto', 'raw', 'hourly', 'daily'):
+        return jsonify({"error": "resolution must be auto, raw, hourly or daily"}), 400
+    
+    try:
+        end = parse_time(request.args.get('end'), time.time())
+        start = parse_time(request.args.get('start'), end - 7 * 86400)
+    except ValueError:
+        return jsonify({"error": "start and end must be epoch seconds or ISO 8601 timestamps"}), 400
+    
+    sites, rows = history_store.query(start, end, name=city, country=country,
+                                      continent=continent, resolution=resolution)
+    return jsonify({
+        'sites': [dict(history_store.sites()[key], key=key) for key in sites],
+        'start': start,
+        'end': end,
+        'resolution': resolution,
+        'points': len(rows),
+        'series': rows_to_columns(rows)
+    })
+
+@app.route('/api/rollups')
+def rollup_summary():
+    """Running aggregates per country (default), continent or for the globe"""
+    if not key_pool:
+        return jsonify({"error": "WeatherAPI key not found. Please add WEATHER_API_KEYS (or WEATHER_API_KEY) to your .env file"}), 500
+    
+    level = request.args.get('level', 'country')
+    if level not in LEVELS:
+        return jsonify({"error": f"level must be one of: {', '.join(LEVELS)}"}), 400
+    
+    snapshot = snapshot_refresher.current()
+    if snapshot is None:
+        return jsonify({"error": "Weather data is still loading, please retry shortly"}), 503
+    # A snapshot restored from disk comes without the rollups; the next successful crawl fills them in
+    if snapshot.restored and rollups.summary('global') is None:
+        return jsonify({"error": "Rollups are rebuilt by the next successful crawl, please retry shortly"}), 503
+    
+    key = request.args.get('key')
+    if key is not None:
+        rollup = rollups.summary(level, key)
+        if rollup is None:
+            return jsonify({"error": f"No observations for {level} '{key}'"}), 404
+        nodes = {key: rollup}
+    else:
+        nodes = rollups.level(level)
+    
+    return jsonify({
+        'level': level,
+        'generated_at': datetime.fromtimestamp(snapshot.generated_at, timezone.utc).isoformat(),
+        'rollups': {
+            name: {
+                'count': node['count'],
+                'weather_summary': node['conditions'],
+                **{field: {stat: round(value, 2) if isinstance(value, float) else value
+                           for stat, value in node[field].items() if stat != 'count'}
+                   for field in ('temp', 'energy_index', 'humidity')}
+            }
+            for name, node in nodes.items()
+        }
+    })
+
+@app.route('/api/cache-stats')
+def cache_stats():
+    """Expose weather cache hit/miss counters for this worker"""
+    return jsonify(weather_cache.stats())
+
+@app.route('/api/admin/api-keys')
+def api_key_usage():
+    """Calls, budget and health per WeatherAPI key (masked); needs `Authorization: Bearer <ADMIN_TOKEN>`"""
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if not admin_token:
+        return jsonify({"error": "Admin endpoints are disabled. Set ADMIN_TOKEN to enable them"}), 404
+
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(supplied.encode('utf-8'), admin_token.encode('utf-8')):
+        return jsonify({"error": "Invalid admin token"}), 401
+
+    response = jsonify(key_pool.stats())
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def continent_label(continent):
+    """'north_america' -> 'North America'"""
+    return continent.replace('_', ' ').title()
+
+def build_global_summary(continents):
+    """Global trends derived from one continent overview snapshot"""
+    cities = [city for overview in continents.values() for city in overview['cities']]
+    reporting = {continent: overview for continent, overview in continents.items() if overview['cities']}
+    
+    global_trends = {
+        'avg_energy_efficiency': 0,
+        'most_efficient_continent': None,
+        'least_efficient_continent': None,
+        'highest_consumption_continent': None,
+        # Not derivable from weather data; kept as reference information
+        'renewable_energy_leaders': ['Europe', 'Oceania'],
+        'weather_impact_factor': 0,  # Share of energy index variance explained by weather
+        'weather_correlations': {},
+        'cities_reporting': len(cities)
+    }
+    
+    if cities:
+        indices = [city['energy_metrics']['total_energy_index'] for city in cities]
+        impact = weather_impact(
+            [city['temperature'] for city in cities],
+            [city['humidity'] for city in cities],
+            [city['wind_speed'] for city in cities],
+            indices
+        )
+        by_average = sorted(reporting, key=lambda continent: reporting[continent]['avg_energy_index'])
+        by_total = max(reporting, key=lambda continent: sum(
+            city['energy_metrics']['total_energy_index'] for city in reporting[continent]['cities']
+        ))
+        global_trends.update({
+            'avg_energy_efficiency': round(sum(indices) / len(indices), 1),
+            'most_efficient_continent': continent_label(by_average[0]),
+            'least_efficient_continent': continent_label(by_average[-1]),
+            'highest_consumption_continent': continent_label(by_total),
+            'weather_impact_factor': round(impact['r_squared'], 2),
+            'weather_correlations': {name: round(value, 2) for name, value in impact['correlations'].items()}
+        })
+    
+    return {
+        'global_trends': global_trends,
         'insights': [
             "Temperature extremes increase energy consumption by up to 40%",
             "Humidity levels above 70% significantly impact cooling costs",
@@ -311,8 +1120,22 @@ def global_energy_summary():
             "Develop energy storage for weather-dependent consumption patterns"
         ]
     }
+
+@app.route('/api/global-energy-summary')
+def global_energy_summary():
+    """Get global energy consumption patterns summary"""
+    if not key_pool:
+        return jsonify({"error": "WeatherAPI key not found. Please add WEATHER_API_KEYS (or WEATHER_API_KEY) to your .env file"}), 500
+    
+    snapshot = snapshot_refresher.current()
+    if snapshot is None:
+        return jsonify({"error": "Weather data is still loading, please retry shortly"}), 503
     
-    return jsonify(summary)
+    # Derived once per snapshot version, then served from the response cache
+    encoded = response_cache.get('summary', snapshot.version, snapshot.generated_at,
+                                 lambda: build_global_summary(snapshot.continents))
+    return conditional_json_response(encoded, snapshot.headers(snapshot_refresher.stale_after))
+
 if __name__ == "__main__":        # ✅ No indentation (correct)
     import os
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,373 @@
+"""ASGI entry point for the async serving mode.
+
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker --workers 2
+    uvicorn asgi:application --workers 2
+
+Upstream fetches (the background snapshot crawl and the live NDJSON
+stream) are awaited concurrently on one shared httpx.AsyncClient per
+worker instead of holding a thread per call, and requests that arrive
+before the first snapshot wait on the event loop rather than in a thread.
+Every other route is the unchanged Flask app, run on a thread pool.
+`gunicorn app:app` keeps serving the plain sync mode.
+"""
+import io
+import os
+import sys
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+import app as dashboard
+from http_client import AsyncPooledHTTPClient, CircuitOpenError, redact
+from records import parse_json
+
+DEFAULT_CONCURRENCY = 100   # Upstream calls in flight per worker; the token bucket still caps the rate
+DEFAULT_WSGI_THREADS = 32
+
+STREAM_PATH = '/api/weather-energy-by-continent/stream'
+# Routes that read the snapshot; before the first one exists they wait here, not in a thread
+SNAPSHOT_PATHS = ('/api/weather-energy-by-continent', '/api/continent-details/', '/api/global-energy-summary',
+                  '/api/forecast/', '/api/rollups')
+
+
+async def acquire_token(timeout):
+    """Non-blocking wait on the shared token bucket"""
+    give_up_at = time.monotonic() + timeout
+    while not dashboard.rate_limiter.acquire(timeout=0):
+        remaining = give_up_at - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(remaining, 1 / dashboard.rate_limiter.rate))
+    return True
+
+
+class AsyncWeatherFetcher:
+    """Async versions of get_weather_data / _chunk / _batch over one shared client.
+
+    The weather cache and the key pool take locks shared with the WSGI
+    threads and may wait on SQLite, so every call into them (including
+    the response handlers, which store results) runs in a worker thread
+    rather than on the event loop.
+    """
+
+    def __init__(self, client, concurrency=DEFAULT_CONCURRENCY):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self._inflight = {}
+
+    async def fetch(self, lat, lon):
+        """One location; None on any failure, like get_weather_data"""
+        cached = await asyncio.to_thread(dashboard.weather_cache.get, lat, lon)
+        if cached is not None:
+            return cached
+
+        # Concurrent streams asking for the same city share one upstream call. Shielded, so one
+        # caller hitting its deadline does not cancel the fetch for the others
+        key = dashboard.cache_key(lat, lon)
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = self._inflight[key] = asyncio.ensure_future(self.fetch_upstream(lat, lon))
+            pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+            dashboard.SINGLEFLIGHT_EVENTS.inc(kind='city', event='leader')
+        else:
+            dashboard.SINGLEFLIGHT_EVENTS.inc(kind='city', event='follower')
+        return await asyncio.shield(pending)
+
+    async def fetch_upstream(self, lat, lon):
+        """One uncached forecast.json call, like fetch_weather_data"""
+        async with self.semaphore:
+            if not await acquire_token(dashboard.fetch_engine.deadline):
+                print(f"Rate limit wait exceeded for {lat},{lon}")
+                dashboard.UPSTREAM_ERRORS.inc(kind='single', reason='rate_limited')
+                return None
+            api_key = await asyncio.to_thread(dashboard.key_pool.acquire)
+            if api_key is None:
+                print(f"No API key with budget left for {lat},{lon}")
+                dashboard.UPSTREAM_ERRORS.inc(kind='single', reason='no_api_key')
+                return None
+            started = time.perf_counter()
+            try:
+                response = await self.client.get(dashboard.forecast_url(f"{lat},{lon}", api_key))
+            except CircuitOpenError as e:
+                print(f"Skipping {lat},{lon}: {e}")
+                dashboard.UPSTREAM_ERRORS.inc(kind='single', reason='circuit_open')
+                await asyncio.to_thread(dashboard.key_pool.refund, api_key)
+                return None
+            except httpx.HTTPError as e:
+                print(f"Upstream request failed for {lat},{lon}: {redact(e)}")
+                dashboard.UPSTREAM_ERRORS.inc(kind='single', reason='exception')
+                await asyncio.to_thread(dashboard.key_pool.refund, api_key)
+                return None
+            except asyncio.CancelledError:
+                await asyncio.to_thread(dashboard.key_pool.refund, api_key)
+                raise
+        elapsed = time.perf_counter() - started
+
+        def handle():
+            dashboard.key_pool.report(api_key, response.status_code)
+            return dashboard.handle_forecast_response(lat, lon, response.status_code,
+                                                      lambda: parse_json(response.content), elapsed)
+        return await asyncio.to_thread(handle)
+
+    async def fetch_chunk(self, locations):
+        """One bulk call; {cache_key: data} or None, like get_weather_data_chunk"""
+        async with self.semaphore:
+            if not await acquire_token(dashboard.fetch_engine.deadline):
+                print(f"Rate limit wait exceeded for bulk chunk of {len(locations)}")
+                dashboard.UPSTREAM_ERRORS.inc(kind='bulk', reason='rate_limited')
+                return None
+            api_key = await asyncio.to_thread(dashboard.key_pool.acquire, len(locations), True)
+            if api_key is None:
+                print(f"No bulk-capable API key with budget left for chunk of {len(locations)}")
+                dashboard.UPSTREAM_ERRORS.inc(kind='bulk', reason='no_api_key')
+                return None
+            started = time.perf_counter()
+            try:
+                response = await self.client.request('POST', dashboard.forecast_url('bulk', api_key),
+                                                     json=dashboard.bulk_request_body(locations))
+            except CircuitOpenError as e:
+                print(f"Skipping bulk chunk: {e}")
+                dashboard.UPSTREAM_ERRORS.inc(kind='bulk', reason='circuit_open')
+                await asyncio.to_thread(dashboard.key_pool.refund, api_key, len(locations))
+                return None
+            except httpx.HTTPError as e:
+                print(f"Bulk request failed: {redact(e)}")
+                dashboard.UPSTREAM_ERRORS.inc(kind='bulk', reason='exception')
+                await asyncio.to_thread(dashboard.key_pool.refund, api_key, len(locations))
+                return None
+            except asyncio.CancelledError:
+                # gather() gave up on the chunk at the fetch deadline, before any answer came back
+                await asyncio.to_thread(dashboard.key_pool.refund, api_key, len(locations))
+                raise
+        return await asyncio.to_thread(dashboard.handle_bulk_response, api_key, response.status_code,
+                                       lambda: parse_json(response.content), time.perf_counter() - started)
+
+    async def gather(self, items, fetch, deadline):
+        """[(item, value, error)] in input order, with FetchEngine's error markers"""
+        tasks = [asyncio.ensure_future(fetch(item)) for item in items]
+        if tasks:
+            await asyncio.wait(tasks, timeout=deadline)
+        results = []
+        for item, task in zip(items, tasks):
+            if not task.done():
+                task.cancel()
+                results.append((item, None, 'timeout'))
+            elif task.exception() is not None:
+                results.append((item, None, str(task.exception())))
+            else:
+                value = task.result()
+                results.append((item, value, None if value is not None else 'unavailable'))
+        return results
+
+    async def fetch_batch(self, locations):
+        """Cache hits, then bulk chunks, then single fetches; same contract as get_weather_data_batch"""
+        started = time.monotonic()
+        coords = {dashboard.cache_key(lat, lon): (lat, lon) for lat, lon in locations}
+        errors = {}
+        cached = await asyncio.to_thread(lambda: {key: dashboard.weather_cache.get(*coords[key]) for key in coords})
+        found = {key: data for key, data in cached.items() if data is not None}
+        missing = [key for key, data in cached.items() if data is None]
+
+        if missing and dashboard.bulk_available():
+            size = dashboard.BULK_CHUNK_SIZE
+            chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+            results = await self.gather(
+                chunks, lambda chunk: self.fetch_chunk([coords[key] for key in chunk]),
+                dashboard.fetch_engine.deadline
+            )
+            fetched = {key: data for _, chunk, _ in results for key, data in (chunk or {}).items()}
+
+            def store():
+                for key, data in fetched.items():
+                    dashboard.weather_cache.set(*coords[key], data)
+            await asyncio.to_thread(store)
+            found.update(fetched)
+
+        remaining = [key for key in missing if key not in found]
+        if remaining:
+            deadline = max(0, dashboard.fetch_engine.deadline - (time.monotonic() - started))
+            results = await self.gather(remaining, lambda key: self.fetch(*coords[key]), deadline)
+            for key, data, error in results:
+                if data is not None:
+                    found[key] = data
+                else:
+                    errors[key] = error
+
+        results = []
+        for lat, lon in locations:
+            key = dashboard.cache_key(lat, lon)
+            results.append((found[key], None) if key in found else (None, errors.get(key, 'unavailable')))
+        return results
+
+
+class WSGIBridge:
+    """Run a WSGI app on a thread pool behind ASGI.
+
+    Unlike asgiref's WsgiToAsgi, which funnels every call through one
+    shared thread, calls run in parallel. Response bodies are buffered;
+    the only streaming route is served natively below.
+    """
+
+    def __init__(self, wsgi_app, threads=DEFAULT_WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    @staticmethod
+    def environ(scope, body):
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = f'HTTP_{name}'
+            environ[name] = f"{environ[name]},{value}" if name in environ else value
+        return environ
+
+    def _run(self, environ):
+        captured = {}
+        chunks = []
+
+        def start_response(status, headers, exc_info=None):
+            captured['status'] = int(status.split(' ', 1)[0])
+            captured['headers'] = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+            return chunks.append
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            chunks.extend(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return captured['status'], captured['headers'], b''.join(chunks)
+
+    async def __call__(self, scope, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        loop = asyncio.get_running_loop()
+        status, headers, content = await loop.run_in_executor(self.executor, self._run, self.environ(scope, body))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+
+class AsyncDashboard:
+    """The ASGI application: native async routes first, Flask for the rest"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi = WSGIBridge(wsgi_app, int(os.getenv('ASGI_WSGI_THREADS', DEFAULT_WSGI_THREADS)))
+        self.concurrency = int(os.getenv('ASYNC_FETCH_CONCURRENCY', DEFAULT_CONCURRENCY))
+        self.fetcher = None
+
+    async def startup(self):
+        loop = asyncio.get_running_loop()
+        client = AsyncPooledHTTPClient(dashboard.http_client, pool_size=self.concurrency)
+        self.fetcher = AsyncWeatherFetcher(client, self.concurrency)
+
+        def fetch_batch(locations):
+            # Runs in the snapshot refresher's thread; the fetches run on this loop
+            return asyncio.run_coroutine_threadsafe(self.fetcher.fetch_batch(locations), loop).result()
+
+        dashboard.fetch_weather_batch = fetch_batch
+        dashboard.snapshot_refresher.start()
+
+    async def shutdown(self):
+        dashboard.fetch_weather_batch = dashboard.get_weather_data_batch
+        if self.fetcher is not None:
+            await self.fetcher.client.aclose()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def wait_for_snapshot(self):
+        refresher = dashboard.snapshot_refresher
+        refresher.start()
+        give_up_at = time.monotonic() + refresher.first_build_wait
+        while not refresher.ready and time.monotonic() < give_up_at:
+            await asyncio.sleep(0.05)
+
+    async def stream(self, scope, receive, send):
+        """Async twin of the Flask NDJSON stream route"""
+        started = time.perf_counter()
+        if not dashboard.key_pool:
+            return await self.wsgi(scope, receive, send)  # Flask renders the error
+
+        headers = [(b'content-type', b'application/x-ndjson')]
+        headers += [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in dashboard.STREAM_HEADERS.items()]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        dashboard.HTTP_SECONDS.observe(time.perf_counter() - started, route=STREAM_PATH, method='GET', status=200)
+
+        stream = dashboard.ContinentStream()
+        tasks = {
+            asyncio.ensure_future(self.fetcher.fetch(city['lat'], city['lon'])): (continent, city)
+            for continent, cities in dashboard.CITIES_BY_CONTINENT.items() for city in cities
+        }
+        give_up_at = time.monotonic() + dashboard.fetch_engine.deadline
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0, give_up_at - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    error = str(task.exception()) if task.exception() is not None else None
+                    weather_data = task.result() if error is None else None
+                    lines = stream.city(*tasks[task], weather_data, error)
+                    await send({'type': 'http.response.body', 'body': ''.join(lines).encode('utf-8'), 'more_body': True})
+            for task in pending:
+                lines = stream.city(*tasks[task], None, 'timeout')
+                await send({'type': 'http.response.body', 'body': ''.join(lines).encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': stream.done().encode('utf-8')})
+        finally:
+            # Client went away or we timed out: stop fetching for this request
+            for task in pending:
+                task.cancel()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise RuntimeError(f"Unsupported ASGI scope type: {scope['type']}")
+        if self.fetcher is None:
+            await self.startup()  # Servers run without lifespan events
+        if scope['path'] == STREAM_PATH:
+            return await self.stream(scope, receive, send)
+        # Without a key no snapshot is coming, and Flask answers with the error right away
+        if (scope['path'].startswith(SNAPSHOT_PATHS) and dashboard.key_pool
+                and not dashboard.snapshot_refresher.ready):
+            await self.wait_for_snapshot()
+        await self.wsgi(scope, receive, send)
+
+
+application = AsyncDashboard(dashboard.app)
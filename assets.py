@@ -0,0 +1,150 @@
+"""Build fingerprinted, precompressed copies of the dashboard's static files.
+
+Each source is minified, named after a hash of its content and written
+to static/dist with .gz and .br siblings next to a manifest.json mapping
+the source path to the built one and to a hash of the source it was
+built from. app.py reads the manifest to point url_for('static', ...) at
+the built files, which can then be cached for good since a new build
+gets a new name; a source edited after the build no longer matches its
+hash and is served as the plain file until the next build. Files from
+earlier builds are left in place and still served, so pages rendered
+before a deploy keep working.
+
+Usage: python assets.py [--static-dir static]
+"""
+import os
+import re
+import gzip
+import json
+import hashlib
+import argparse
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only .gz siblings are written
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:  # Optional: JavaScript is then shipped unminified
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:  # Optional: a conservative regex minifier is the fallback
+    rcssmin = None
+
+SOURCES = ('style.css', 'JS/script.js', 'continents.geo.json')
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_BYTES = 8
+# Served once per hashed name, so build time goes into the smallest output
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+COMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    return re.sub(r'\s*([{};,>])\s*', r'\1', text).replace(';}', '}').strip()
+
+
+def minify_js(text):
+    return rjsmin.jsmin(text) if rjsmin is not None else text
+
+
+def minify_json(text):
+    return json.dumps(json.loads(text), separators=(',', ':'), ensure_ascii=False)
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js, '.json': minify_json}
+
+
+def source_digest(text):
+    """Hash of a source file's text, recorded so a later edit can be told from the build"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=HASH_BYTES).hexdigest()
+
+
+def is_current(static_dir, name, entry):
+    """Whether the source behind a manifest entry is unchanged since it was built"""
+    try:
+        with open(os.path.join(static_dir, name), encoding='utf-8') as f:
+            return entry.get('source') == source_digest(f.read())
+    except (OSError, ValueError):
+        return False
+
+
+def fingerprint(name, body):
+    """'JS/script.js' -> 'JS/script.<hash>.js' for the built body"""
+    stem, ext = os.path.splitext(name)
+    if name.endswith('.geo.json'):
+        stem, ext = name[:-len('.geo.json')], '.geo.json'
+    return f'{stem}.{hashlib.blake2b(body, digest_size=HASH_BYTES).hexdigest()}{ext}'
+
+
+def compressed_variants(body):
+    variants = {'gzip': gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+    # A variant that doesn't save anything is just extra work for the client
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build(static_dir='static', sources=SOURCES):
+    """Write the built files and manifest; returns the manifest"""
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    manifest = {}
+    for name in sources:
+        with open(os.path.join(static_dir, name), encoding='utf-8') as f:
+            text = f.read()
+        minify = MINIFIERS.get(os.path.splitext(name)[1], lambda text: text)
+        body = minify(text).encode('utf-8')
+        built = fingerprint(name, body)
+        write_file(os.path.join(dist_dir, built), body)
+        variants = compressed_variants(body)
+        for encoding, data in variants.items():
+            write_file(os.path.join(dist_dir, built + COMPRESSED_SUFFIXES[encoding]), data)
+        manifest[name] = {'path': built, 'bytes': len(body), 'encodings': sorted(variants),
+                          'source': source_digest(text)}
+    write_file(os.path.join(dist_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def load_manifest(static_dir='static'):
+    """{source path: entry} from the last build, or {} when nothing was built"""
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Ignoring asset manifest: {e}")
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--static-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    args = parser.parse_args()
+
+    for name, entry in build(args.static_dir).items():
+        with open(os.path.join(args.static_dir, name), 'rb') as f:
+            source_bytes = len(f.read())
+        sizes = '  '.join(f"{encoding} {os.path.getsize(os.path.join(args.static_dir, DIST_DIR, entry['path'] + COMPRESSED_SUFFIXES[encoding])):,} B"
+                          for encoding in entry['encodings'])
+        print(f"{name} -> {DIST_DIR}/{entry['path']}: {source_bytes:,} -> {entry['bytes']:,} B  {sizes}")
+
+
+if __name__ == '__main__':
+    main()
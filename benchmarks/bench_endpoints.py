@@ -0,0 +1,166 @@
+"""End-to-end latency and throughput of the dashboard API under gunicorn.
+
+Starts mock_weatherapi.py as the upstream and the app under gunicorn with
+N workers, waits for the first snapshot, then drives each endpoint with
+C concurrent keep-alive clients for a fixed duration.
+
+Usage: python benchmarks/bench_endpoints.py [--workers 2] [--concurrency 8] [--duration 10]
+           [--upstream-latency lognormal:80:0.5] [--upstream-error-rate 0] [--json PATH]
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from report import latency_summary, write_results  # noqa: E402
+
+DEFAULT_ENDPOINTS = [
+    '/api/weather-energy-by-continent',
+    '/api/continent-details/europe',
+    '/api/global-energy-summary'
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(url, timeout, ok=(200,)):
+    """Poll url until it answers with an ok status; returns seconds waited"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if requests.get(url, timeout=timeout).status_code in ok:
+                return time.perf_counter() - started
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def drive(url, concurrency, duration, headers):
+    """Hammer one URL from `concurrency` threads; returns latencies, status counts, elapsed"""
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        local_latencies, local_statuses = [], Counter()
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                status = session.get(url, headers=headers, timeout=30).status_code
+            except requests.RequestException:
+                status = 'error'
+            local_latencies.append(time.perf_counter() - start)
+            local_statuses[status] += 1
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument('--threads', type=int, default=1, help="gunicorn threads per worker")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent benchmark clients")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per endpoint")
+    parser.add_argument('--endpoints', nargs='+', default=DEFAULT_ENDPOINTS)
+    parser.add_argument('--revalidate', action='store_true',
+                        help="Send the first response's ETag back as If-None-Match (304 path)")
+    parser.add_argument('--upstream-latency', default='lognormal:80:0.5', help="mock_weatherapi --latency spec")
+    parser.add_argument('--upstream-error-rate', type=float, default=0.0)
+    parser.add_argument('--upstream-throttle-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--startup-timeout', type=float, default=60)
+    parser.add_argument('--json', help="Result file (default benchmarks/results/endpoints-<timestamp>.json)")
+    args = parser.parse_args()
+
+    upstream_port, app_port = free_port(), free_port()
+    # Every file the app keeps between runs lives here, so each run starts cold and leaves no trace
+    workdir = tempfile.mkdtemp(prefix='enerwe-bench-')
+    env = dict(
+        os.environ,
+        WEATHER_API_BASE_URL=f'http://127.0.0.1:{upstream_port}/v1',
+        WEATHER_API_KEY=os.getenv('WEATHER_API_KEY', 'bench'),
+        WEATHER_CACHE_PATH=os.path.join(workdir, 'weather-cache.sqlite3'),
+        HISTORY_DIR=os.path.join(workdir, 'history'),
+        SNAPSHOT_PATH=os.path.join(workdir, 'snapshot.json.z'),
+        SINGLEFLIGHT_DIR=os.path.join(workdir, 'singleflight'),
+        WEATHER_API_KEY_DB=os.path.join(workdir, 'api-keys.sqlite3'),
+        WEATHER_API_RATE=os.getenv('WEATHER_API_RATE', '1000'),
+        WEATHER_API_BURST=os.getenv('WEATHER_API_BURST', '100')
+    )
+    processes = []
+    try:
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'mock_weatherapi.py'), '--port', str(upstream_port),
+             '--seed', str(args.seed), '--latency', args.upstream_latency,
+             '--error-rate', str(args.upstream_error_rate), '--throttle-rate', str(args.upstream_throttle_rate)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+        wait_until(f'http://127.0.0.1:{upstream_port}/_stats', args.startup_timeout)
+
+        processes.append(subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers), '--threads', str(args.threads),
+             '--bind', f'127.0.0.1:{app_port}', '--log-level', 'warning', 'app:app'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+        base = f'http://127.0.0.1:{app_port}'
+        # Every worker builds its own first snapshot; poll until one answers with data
+        first_snapshot = wait_until(f'{base}{DEFAULT_ENDPOINTS[0]}', args.startup_timeout)
+        print(f"First snapshot after {first_snapshot:.2f}s "
+              f"({args.workers} workers, upstream latency {args.upstream_latency})")
+
+        results = {'first_snapshot_s': round(first_snapshot, 3), 'endpoints': {}}
+        for endpoint in args.endpoints:
+            url = f'{base}{endpoint}'
+            headers = {}
+            if args.revalidate:
+                etag = requests.get(url, timeout=30).headers.get('ETag')
+                if etag:
+                    headers['If-None-Match'] = etag
+            latencies, statuses, elapsed = drive(url, args.concurrency, args.duration, headers)
+            summary = latency_summary(latencies, elapsed)
+            summary['statuses'] = {str(status): count for status, count in sorted(statuses.items(), key=str)}
+            results['endpoints'][endpoint] = summary
+            print(f"{endpoint:<40} p50 {summary['p50_ms']:>8.2f} ms  p95 {summary['p95_ms']:>8.2f} ms  "
+                  f"p99 {summary['p99_ms']:>8.2f} ms  {summary['rps']:>9,.1f} req/s  {summary['statuses']}")
+
+        results['upstream'] = requests.get(f'http://127.0.0.1:{upstream_port}/_stats', timeout=5).json()
+        print(f"Saved {write_results('endpoints', vars(args), results, args.json)}")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
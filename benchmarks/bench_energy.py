@@ -0,0 +1,96 @@
+"""Throughput of the scalar vs vectorised energy metrics.
+
+Usage: python benchmarks/bench_energy.py [--sizes 1000 10000 100000 1000000] [--json PATH]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from energy import calculate_energy_metrics_batch  # noqa: E402
+from report import write_results  # noqa: E402
+
+
+def reference_energy_metrics(temp, humidity, wind_speed):
+    """The original per-city implementation, kept as the baseline"""
+    base_temp = 18
+    if temp < base_temp:
+        heating_demand = (base_temp - temp) * 1.5
+        cooling_demand = 0
+    else:
+        heating_demand = 0
+        cooling_demand = (temp - base_temp) * 1.2
+    humidity_factor = 1 + (humidity - 50) / 100
+    wind_factor = max(0.8, 1 - wind_speed / 50)
+    total_energy_index = (heating_demand + cooling_demand) * humidity_factor * wind_factor
+    return {
+        'heating_demand': round(heating_demand, 2),
+        'cooling_demand': round(cooling_demand, 2),
+        'total_energy_index': round(total_energy_index, 2),
+        'efficiency_rating': 'High' if total_energy_index < 10 else 'Medium' if total_energy_index < 20 else 'Low'
+    }
+
+
+def make_inputs(n, seed=42):
+    rng = np.random.default_rng(seed)
+    return (
+        np.round(rng.uniform(-30, 45, n), 1),   # WeatherAPI reports 0.1C resolution
+        rng.integers(5, 100, n).astype(np.float64),
+        rng.uniform(0, 30, n)
+    )
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def check_identical(temps, humidities, winds, batch):
+    for i in range(len(temps)):
+        expected = reference_energy_metrics(float(temps[i]), float(humidities[i]), float(winds[i]))
+        for key in ('heating_demand', 'cooling_demand', 'total_energy_index'):
+            if batch[key][i] != expected[key]:
+                raise AssertionError(f"row {i} {key}: {batch[key][i]!r} != {expected[key]!r}")
+        if batch['efficiency_rating'][i] != expected['efficiency_rating']:
+            raise AssertionError(f"row {i} efficiency_rating differs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help="Result file (default benchmarks/results/energy-<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'rows':>10} {'scalar s':>10} {'batch s':>10} {'rows/s batch':>14} {'speedup':>8}")
+    for n in args.sizes:
+        temps, humidities, winds = make_inputs(n)
+        rows = list(zip(temps.tolist(), humidities.tolist(), winds.tolist()))
+        scalar_time, _ = timed(lambda: [reference_energy_metrics(*row) for row in rows], 1 if n >= 100000 else args.repeat)
+        batch_time, batch = timed(lambda: calculate_energy_metrics_batch(temps, humidities, winds), args.repeat)
+        check_identical(temps, humidities, winds, batch)
+        print(f"{n:>10} {scalar_time:>10.4f} {batch_time:>10.4f} {n / batch_time:>14,.0f} {scalar_time / batch_time:>7.1f}x")
+        results.append({
+            'rows': n,
+            'scalar_s': scalar_time,
+            'batch_s': batch_time,
+            'scalar_rows_per_s': n / scalar_time,
+            'batch_rows_per_s': n / batch_time,
+            'speedup': scalar_time / batch_time
+        })
+
+    print(f"Saved {write_results('energy', vars(args), results, args.json)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Size and serialization cost of the city-list response formats.
+
+Builds a continent-details payload for N synthetic cities from the seeded
+stand-in, then encodes it as JSON, columnar JSON and MessagePack, raw and
+compressed as the server would send it.
+
+Usage: python benchmarks/bench_formats.py [--cities 2000] [--repeat 20] [--json PATH]
+"""
+import os
+import sys
+import gzip
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Importing app must not touch the shared cache or the history directory
+os.environ.setdefault('WEATHER_CACHE_PATH', '')
+os.environ.setdefault('HISTORY_DIR', '')
+
+from app import calculate_energy_metrics, detail_continent, transform_weather_payload  # noqa: E402
+from http_cache import BROTLI_QUALITY, GZIP_LEVEL, FORMATS, available_formats, brotli  # noqa: E402
+from mock_weatherapi import WeatherGenerator  # noqa: E402
+from report import latency_summary, write_results  # noqa: E402
+
+
+def synthetic_details(count, seed):
+    generator = WeatherGenerator(seed=seed)
+    results = []
+    for i in range(count):
+        lat, lon = round(-60 + 120 * i / count, 4), round(-180 + 360 * i / count, 4)
+        weather_data = transform_weather_payload(generator.forecast(lat, lon, days=3, now=1760000000))
+        current = weather_data.current
+        metrics = calculate_energy_metrics(current.temp, current.humidity, current.wind_speed)
+        results.append(({'name': f'City {i}', 'country': 'XX', 'lat': lat, 'lon': lon}, weather_data, None, metrics))
+    return detail_continent('europe', results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cities', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Result file (default benchmarks/results/formats-<timestamp>.json)")
+    args = parser.parse_args()
+
+    payload = synthetic_details(args.cities, args.seed)
+    results = {}
+    for fmt in available_formats():
+        encode = FORMATS[fmt][1]
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = encode(payload)
+            samples.append(time.perf_counter() - start)
+        results[fmt] = {
+            'bytes': len(body),
+            'gzip_bytes': len(gzip.compress(body, compresslevel=GZIP_LEVEL)),
+            'br_bytes': len(brotli.compress(body, quality=BROTLI_QUALITY)) if brotli else None,
+            'serialize': latency_summary(samples)
+        }
+        print(f"{fmt:>9}: {len(body):>10,} B  gzip {results[fmt]['gzip_bytes']:>9,} B  "
+              f"br {results[fmt]['br_bytes'] or 0:>9,} B  serialize p50 {results[fmt]['serialize']['p50_ms']:.2f} ms")
+
+    print(f"Saved {write_results('formats', vars(args), results, args.json)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Cost of turning WeatherAPI forecast.json responses into the dashboard's format.
+
+Times parse_json + transform_weather_payload (what get_weather_data does
+per city) and the transform alone, on payloads from the seeded stand-in.
+
+Usage: python benchmarks/bench_transform.py [--payloads 500] [--days 3] [--json PATH]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Importing app must not touch the shared cache or the history directory
+os.environ.setdefault('WEATHER_CACHE_PATH', '')
+os.environ.setdefault('HISTORY_DIR', '')
+
+from app import transform_weather_payload  # noqa: E402
+from records import parse_json  # noqa: E402
+from mock_weatherapi import WeatherGenerator  # noqa: E402
+from report import latency_summary, write_results  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--payloads', type=int, default=500)
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Result file (default benchmarks/results/transform-<timestamp>.json)")
+    args = parser.parse_args()
+
+    generator = WeatherGenerator(seed=args.seed)
+    bodies = [
+        json.dumps(generator.forecast(-60 + 120 * i / args.payloads, -180 + 360 * i / args.payloads, days=args.days,
+                                      now=1760000000)).encode('utf-8')
+        for i in range(args.payloads)
+    ]
+    parsed = [parse_json(body) for body in bodies]
+
+    results = {'payload_bytes': sum(len(body) for body in bodies) // len(bodies)}
+    for name, run in (
+        ('parse_and_transform', lambda i: transform_weather_payload(parse_json(bodies[i]))),
+        ('transform_only', lambda i: transform_weather_payload(parsed[i]))
+    ):
+        samples = []
+        started = time.perf_counter()
+        for i in range(args.payloads):
+            start = time.perf_counter()
+            run(i)
+            samples.append(time.perf_counter() - start)
+        results[name] = latency_summary(samples, time.perf_counter() - started)
+        print(f"{name:>20}: p50 {results[name]['p50_ms']:.3f} ms  p99 {results[name]['p99_ms']:.3f} ms  "
+              f"{results[name]['rps']:,.0f} payloads/s")
+
+    print(f"Saved {write_results('transform', vars(args), results, args.json)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import os
+import csv
+import json
+import math
+from collections import defaultdict
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_CELL_DEGREES = 1.0
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance from one point to arrays of points, in km"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons - lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class CityRegistry:
+    """All monitored sites with attribute and spatial indexes.
+
+    Coordinates live in NumPy columns. The spatial index is a fixed
+    lat/lon grid stored CSR-style: site indices sorted by cell id plus an
+    offsets array, so every row of a bounding box is one contiguous slice.
+    Continent and country lookups are precomputed index arrays.
+    """
+
+    def __init__(self, sites, cell_degrees=DEFAULT_CELL_DEGREES):
+        self.sites = sites
+        self.cell_degrees = cell_degrees
+        self.lats = np.array([site['lat'] for site in sites], dtype=np.float64)
+        self.lons = np.array([site['lon'] for site in sites], dtype=np.float64)
+
+        by_continent = defaultdict(list)
+        by_country = defaultdict(list)
+        for i, site in enumerate(sites):
+            by_continent[site['continent']].append(i)
+            by_country[site['country'].upper()].append(i)
+        self.by_continent = {key: np.array(idx, dtype=np.int64) for key, idx in by_continent.items()}
+        self.by_country = {key: np.array(idx, dtype=np.int64) for key, idx in by_country.items()}
+
+        # Integer codes per site make continent/country filters one vector compare
+        self._continent_codes = {key: code for code, key in enumerate(self.by_continent)}
+        self._country_codes = {key: code for code, key in enumerate(self.by_country)}
+        self._site_continent = np.array([self._continent_codes[s['continent']] for s in sites], dtype=np.int32)
+        self._site_country = np.array([self._country_codes[s['country'].upper()] for s in sites], dtype=np.int32)
+
+        self.rows = int(math.ceil(180 / cell_degrees))
+        self.cols = int(math.ceil(360 / cell_degrees))
+        cells = self._row(self.lats) * self.cols + self._col(self.lons)
+        self._order = np.argsort(cells, kind='stable')
+        counts = np.bincount(cells, minlength=self.rows * self.cols)
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    @classmethod
+    def from_continents(cls, cities_by_continent, **kwargs):
+        """Registry over the built-in CITIES_BY_CONTINENT mapping"""
+        sites = [
+            dict(city, continent=continent)
+            for continent, cities in cities_by_continent.items()
+            for city in cities
+        ]
+        return cls(cls._with_ids(sites), **kwargs)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Load sites from a JSON list or a CSV with name,country,continent,lat,lon columns"""
+        if path.lower().endswith('.csv'):
+            with open(path, newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+        else:
+            with open(path, encoding='utf-8') as f:
+                rows = json.load(f)
+
+        sites = [
+            {
+                'name': row['name'],
+                'country': row['country'],
+                'continent': row['continent'],
+                'lat': float(row['lat']),
+                'lon': float(row['lon'])
+            }
+            for row in rows
+        ]
+        return cls(cls._with_ids(sites), **kwargs)
+
+    @classmethod
+    def from_env(cls, cities_by_continent):
+        """Load CITY_REGISTRY_PATH if set, otherwise index the built-in cities"""
+        path = os.getenv('CITY_REGISTRY_PATH')
+        if path:
+            return cls.from_file(path)
+        return cls.from_continents(cities_by_continent)
+
+    @staticmethod
+    def _with_ids(sites):
+        for i, site in enumerate(sites):
+            site['id'] = i
+        return sites
+
+    def __len__(self):
+        return len(self.sites)
+
+    # --- grid helpers ---
+    def _row(self, lats):
+        return np.clip(((np.asarray(lats) + 90) // self.cell_degrees).astype(np.int64), 0, self.rows - 1)
+
+    def _col(self, lons):
+        wrapped = (np.asarray(lons) + 180) % 360
+        return np.clip((wrapped // self.cell_degrees).astype(np.int64), 0, self.cols - 1)
+
+    def _col_ranges(self, west, east):
+        """Column spans for a lon range, split in two when it crosses the antimeridian"""
+        if east - west >= 360:
+            return [(0, self.cols - 1)]
+        c0 = int(self._col(west))
+        c1 = int(self._col(east))
+        if c0 <= c1:
+            return [(c0, c1)]
+        return [(c0, self.cols - 1), (0, c1)]
+
+    def _cells(self, south, west, north, east):
+        """Indices of every site in the grid cells covering a box (a superset)"""
+        r0 = int(self._row(south))
+        r1 = int(self._row(north))
+        chunks = []
+        for c0, c1 in self._col_ranges(west, east):
+            for row in range(r0, r1 + 1):
+                base = row * self.cols
+                start = self._offsets[base + c0]
+                stop = self._offsets[base + c1 + 1]
+                if stop > start:
+                    chunks.append(self._order[start:stop])
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(chunks)
+
+    def _mask(self, continent=None, country=None):
+        if continent is None and country is None:
+            return None
+        mask = np.ones(len(self.sites), dtype=bool)
+        if continent is not None:
+            mask &= self._site_continent == self._continent_codes.get(continent, -1)
+        if country is not None:
+            mask &= self._site_country == self._country_codes.get(country.upper(), -1)
+        return mask
+
+    # --- queries ---
+    def in_bbox(self, south, west, north, east, continent=None, country=None):
+        """Indices of sites inside a lat/lon box; west > east wraps the antimeridian"""
+        if east - west >= 360:
+            west, east = -180, 180
+        else:
+            # Map viewports can report longitudes outside [-180, 180)
+            west = (west + 180) % 360 - 180
+            east = (east + 180) % 360 - 180
+            if east == -180:
+                east = 180
+        candidates = self._cells(south, west, north, east)
+        lats = self.lats[candidates]
+        lons = self.lons[candidates]
+        inside = (lats >= south) & (lats <= north)
+        if west <= east:
+            inside &= (lons >= west) & (lons <= east)
+        else:
+            inside &= (lons >= west) | (lons <= east)
+        found = candidates[inside]
+        mask = self._mask(continent, country)
+        return found if mask is None else found[mask[found]]
+
+    def nearest(self, lat, lon, n=10, continent=None, country=None):
+        """The n closest sites to a point as [(index, distance_km)], closest first.
+
+        Grow a square of grid cells around the point until it holds n
+        candidates, take the n-th best distance d, then rescan the exact
+        bounding box of the spherical cap of radius d. Every site within d
+        lies in that box, so the result is exact, not approximate.
+        """
+        mask = self._mask(continent, country)
+        total = len(self.sites) if mask is None else int(mask.sum())
+        n = min(n, total)
+        if n <= 0:
+            return []
+
+        radius = self.cell_degrees
+        while True:
+            candidates = self._cells(lat - radius, lon - radius, lat + radius, lon + radius)
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if len(candidates) >= n or radius >= 360:
+                break
+            radius *= 2
+
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        bound = float(np.partition(distances, n - 1)[n - 1])
+
+        candidates = self.in_bbox(*self._cap_bbox(lat, lon, bound), continent=continent, country=country)
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        best = np.argsort(distances, kind='stable')[:n]
+        return [(int(candidates[i]), float(distances[i])) for i in best]
+
+    @staticmethod
+    def _cap_bbox(lat, lon, distance_km):
+        """Bounding box of all points within distance_km of (lat, lon)"""
+        angular = distance_km / EARTH_RADIUS_KM
+        south = lat - math.degrees(angular)
+        north = lat + math.degrees(angular)
+        if south <= -90 or north >= 90:
+            # The cap contains a pole, so it spans every longitude
+            return max(south, -90), -180, min(north, 90), 180
+        dlon = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(lat)))))
+        west = lon - dlon
+        east = lon + dlon
+        if east - west >= 360:
+            return south, -180, north, 180
+        # Normalise into [-180, 180); west > east then means the box wraps
+        west = (west + 180) % 360 - 180
+        east = (east + 180) % 360 - 180
+        return south, west, north, east
+
+    def select(self, continent=None, country=None):
+        """Indices of sites for a continent and/or country via the attribute indexes"""
+        if continent is not None and country is not None:
+            return np.intersect1d(self.by_continent.get(continent, []), self.by_country.get(country.upper(), []))
+        if continent is not None:
+            return self.by_continent.get(continent, np.empty(0, dtype=np.int64))
+        if country is not None:
+            return self.by_country.get(country.upper(), np.empty(0, dtype=np.int64))
+        return np.arange(len(self.sites))
@@ -0,0 +1,53 @@
+try:
+    import msgpack
+except ImportError:  # Optional: without it only the JSON layouts are offered
+    msgpack = None
+
+# Marks an object that stands for a list of records, so decoders can find them
+COLUMNS_KEY = '_columns'
+LENGTH_KEY = '_length'
+
+
+def column_map(records, prefix=''):
+    """{dotted.path: column} for a list of dicts; fields missing from a record are null.
+
+    Built column by column, so each key is looked up once per record
+    rather than every record being flattened into its own dict.
+    """
+    fields = {}
+    for record in records:
+        for key in record:
+            fields.setdefault(key, None)
+    columns = {}
+    for key in fields:
+        column = [record.get(key) for record in records]
+        if all(isinstance(value, dict) and value for value in column):
+            columns.update(column_map(column, f'{prefix}{key}.'))
+        else:
+            columns[f'{prefix}{key}'] = column
+    return columns
+
+
+def to_columns(records):
+    return {COLUMNS_KEY: column_map(records), LENGTH_KEY: len(records)}
+
+
+def columnar(payload):
+    """Payload with every non-empty list of dicts stored column-wise.
+
+    City lists repeat the same keys and nested energy dicts for every
+    entry; column-wise each key appears once. Everything else is kept
+    as is, so the layout round-trips through decodeColumnar in script.js.
+    """
+    if isinstance(payload, dict):
+        return {key: columnar(value) for key, value in payload.items()}
+    if isinstance(payload, list):
+        if payload and all(isinstance(item, dict) for item in payload):
+            return to_columns(payload)
+        return [columnar(item) for item in payload]
+    return payload
+
+
+def pack(payload):
+    """The columnar layout as MessagePack"""
+    return msgpack.packb(columnar(payload), use_bin_type=True)
@@ -0,0 +1,109 @@
+import numpy as np
+
+BASE_TEMP = 18            # Base temperature in Celsius
+HEATING_MULTIPLIER = 1.5
+COOLING_MULTIPLIER = 1.2
+MIN_WIND_FACTOR = 0.8
+
+
+def round_half_even(values, ndigits=2):
+    """np.round that agrees exactly with Python's round() on every element.
+
+    np.round scales by 10**ndigits, rounds and scales back, so when the
+    scaled value lands within float error of a .5 tie it can pick the other
+    side than round() does on the exact double. Those few elements are
+    recomputed with round(); everything else is already identical.
+    """
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    rounded = np.round(values, ndigits)
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded.flat[i] = round(float(values.flat[i]), ndigits)
+    return rounded
+
+
+def calculate_energy_metrics_batch(temps, humidities, wind_speeds):
+    """Vectorised energy metrics for many locations or forecast hours at once.
+
+    Takes array-likes of temperature (C), humidity (%) and wind speed (m/s)
+    and returns a dict of NumPy arrays: heating_demand, cooling_demand,
+    humidity_factor, wind_factor, total_energy_index (demands and index
+    rounded to 2 places) and efficiency_rating. Element for element the
+    results equal app.calculate_energy_metrics.
+    """
+    temps = np.asarray(temps, dtype=np.float64)
+    humidities = np.asarray(humidities, dtype=np.float64)
+    wind_speeds = np.asarray(wind_speeds, dtype=np.float64)
+
+    # Heating degree days (HDD) and Cooling degree days (CDD)
+    heating = temps < BASE_TEMP
+    heating_demand = np.where(heating, (BASE_TEMP - temps) * HEATING_MULTIPLIER, 0.0)
+    cooling_demand = np.where(heating, 0.0, (temps - BASE_TEMP) * COOLING_MULTIPLIER)
+
+    # Higher humidity increases energy needs, wind reduces them slightly
+    humidity_factor = 1 + (humidities - 50) / 100
+    wind_factor = np.maximum(MIN_WIND_FACTOR, 1 - wind_speeds / 50)
+
+    total_energy_index = (heating_demand + cooling_demand) * humidity_factor * wind_factor
+
+    # Rated on the unrounded index, like the scalar version
+    efficiency_rating = np.where(
+        total_energy_index < 10, 'High', np.where(total_energy_index < 20, 'Medium', 'Low')
+    )
+
+    return {
+        'heating_demand': round_half_even(heating_demand),
+        'cooling_demand': round_half_even(cooling_demand),
+        'humidity_factor': humidity_factor,
+        'wind_factor': wind_factor,
+        'total_energy_index': round_half_even(total_energy_index),
+        'efficiency_rating': efficiency_rating
+    }
+
+
+def energy_metrics_rows(metrics):
+    """Split batch output back into the per-location dicts the API returns"""
+    return [
+        {
+            'heating_demand': heating,
+            'cooling_demand': cooling,
+            'total_energy_index': total,
+            'efficiency_rating': rating
+        }
+        for heating, cooling, total, rating in zip(
+            metrics['heating_demand'].tolist(),
+            metrics['cooling_demand'].tolist(),
+            metrics['total_energy_index'].tolist(),
+            metrics['efficiency_rating'].tolist()
+        )
+    ]
+
+
+def weather_impact(temps, humidities, wind_speeds, energy_index):
+    """How much of the spread in energy index the weather explains.
+
+    Fits the index by least squares on distance from the base temperature,
+    humidity and wind speed and returns the fit's R² (0..1) together with
+    each variable's Pearson correlation with the index. Variables that do
+    not vary get a correlation of 0.
+    """
+    features = {
+        'temperature_deviation': np.abs(np.asarray(temps, dtype=np.float64) - BASE_TEMP),
+        'humidity': np.asarray(humidities, dtype=np.float64),
+        'wind_speed': np.asarray(wind_speeds, dtype=np.float64)
+    }
+    target = np.asarray(energy_index, dtype=np.float64)
+
+    correlations = {}
+    for name, values in features.items():
+        spread = values.std() * target.std()
+        correlations[name] = float(np.mean((values - values.mean()) * (target - target.mean())) / spread) if spread else 0.0
+
+    residual_total = np.sum((target - target.mean()) ** 2)
+    if len(target) <= len(features) or not residual_total:
+        return {'r_squared': 0.0, 'correlations': correlations}
+    design = np.column_stack([np.ones(len(target))] + list(features.values()))
+    coefficients = np.linalg.lstsq(design, target, rcond=None)[0]
+    residual = np.sum((target - design @ coefficients) ** 2)
+    return {'r_squared': float(max(0.0, 1 - residual / residual_total)), 'correlations': correlations}
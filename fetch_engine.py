@@ -0,0 +1,132 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed, wait
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_DEADLINE = 8.0   # Seconds a whole fan-out may take before we answer with what we have
+DEFAULT_RATE = 10.0      # Upstream calls per second
+DEFAULT_BURST = 10
+
+
+class TokenBucket:
+    """Thread-safe token bucket enforcing an upstream call rate.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; each
+    upstream call takes one. Callers block until a token is available or
+    their timeout runs out. The bucket is per process, so with several
+    gunicorn workers the provider sees at most workers x rate.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=DEFAULT_BURST):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a limiter from WEATHER_API_RATE / WEATHER_API_BURST"""
+        return cls(
+            rate=float(os.getenv('WEATHER_API_RATE', DEFAULT_RATE)),
+            capacity=int(os.getenv('WEATHER_API_BURST', DEFAULT_BURST))
+        )
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=None):
+        """Take one token, waiting up to `timeout` seconds. Returns False on timeout."""
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait_for = (1 - self._tokens) / self.rate
+            if give_up_at is not None:
+                remaining = give_up_at - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait_for = min(wait_for, remaining)
+            time.sleep(wait_for)
+
+
+class FetchEngine:
+    """Bounded-concurrency fan-out with a per-call deadline.
+
+    `fetch_all` runs `fn` for every item on a shared thread pool and returns
+    once everything finished or the deadline passed, whichever comes first.
+    Items that failed or did not finish in time come back with an error
+    marker instead of holding up the whole response.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, deadline=DEFAULT_DEADLINE):
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='weather-fetch')
+
+    @classmethod
+    def from_env(cls):
+        """Build an engine from FETCH_CONCURRENCY / FETCH_DEADLINE"""
+        return cls(
+            concurrency=int(os.getenv('FETCH_CONCURRENCY', DEFAULT_CONCURRENCY)),
+            deadline=float(os.getenv('FETCH_DEADLINE', DEFAULT_DEADLINE))
+        )
+
+    def fetch_all(self, items, fn, deadline=None):
+        """Return [(item, result, error)] in input order.
+
+        `error` is None on success, 'unavailable' when `fn` returned None,
+        'timeout' when the deadline passed first, or the exception text.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        futures = [self._executor.submit(fn, item) for item in items]
+        wait(futures, timeout=deadline)
+
+        results = []
+        for item, future in zip(items, futures):
+            if not future.done():
+                # Unstarted work is dropped; running calls finish in the
+                # background and still land in the weather cache
+                future.cancel()
+                results.append((item, None, 'timeout'))
+                continue
+            try:
+                value = future.result()
+            except Exception as e:
+                results.append((item, None, str(e)))
+                continue
+            results.append((item, value, None if value is not None else 'unavailable'))
+        return results
+
+    def iter_completed(self, items, fn, deadline=None):
+        """Yield (item, result, error) as each call finishes, in completion order.
+
+        Same error markers as fetch_all; anything still running when the
+        deadline passes is yielded last with a 'timeout' error.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        futures = {self._executor.submit(fn, item): item for item in items}
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                pending.discard(future)
+                item = futures[future]
+                try:
+                    value = future.result()
+                except Exception as e:
+                    yield item, None, str(e)
+                    continue
+                yield item, value, None if value is not None else 'unavailable'
+        except TimeoutError:
+            pass
+        finally:
+            for future in pending:
+                future.cancel()
+        for future in pending:
+            yield futures[future], None, 'timeout'
@@ -0,0 +1,119 @@
+import base64
+
+import numpy as np
+
+from energy import calculate_energy_metrics_batch, round_half_even
+
+HOUR = 3600
+HOURLY_FIELDS = ('time_epoch', 'temp_c', 'humidity', 'wind_kph')
+PROJECTED_FIELDS = ('heating_demand', 'cooling_demand', 'total_energy_index')
+
+
+def hourly_columns(forecastdays):
+    """Flatten WeatherAPI forecastday[].hour[] dicts into one list per field.
+
+    Kept as plain lists so the result stays JSON-serialisable in the
+    weather cache; it replaces ~72 nested hour dicts per city.
+    """
+    hours = [hour for day in forecastdays for hour in day.get('hour', [])]
+    return {field: [hour[field] for hour in hours] for field in HOURLY_FIELDS}
+
+
+class ForecastProjection:
+    """Hourly forecast and projected energy demand for every city on one UTC hour grid.
+
+    Cities report hours from their own local midnight, so rows are aligned
+    on a shared grid starting at the earliest forecast hour of any city;
+    slots a city has no forecast for hold NaN. All arrays are
+    (cities, hours) and every projection is one batched NumPy pass.
+    """
+
+    def __init__(self, sites, start, temp, humidity, wind_speed):
+        self.sites = sites
+        self.start = start
+        self.temp = temp
+        self.humidity = humidity
+        self.wind_speed = wind_speed
+        self.epochs = start + HOUR * np.arange(temp.shape[1], dtype=np.int64)
+
+        metrics = calculate_energy_metrics_batch(temp.ravel(), humidity.ravel(), wind_speed.ravel())
+        for field in PROJECTED_FIELDS:
+            setattr(self, field, metrics[field].reshape(temp.shape))
+        self._by_continent = {}
+        for row, site in enumerate(sites):
+            self._by_continent.setdefault(site['continent'], []).append(row)
+
+    @classmethod
+    def from_hourly(cls, entries):
+        """Build from (site, hourly_columns or None) pairs; site has name, country, continent"""
+        sites = [site for site, _ in entries]
+        rows, lengths = [], []
+        columns = {field: [] for field in HOURLY_FIELDS}
+        for row, (_, hourly) in enumerate(entries):
+            if hourly and hourly['time_epoch']:
+                rows.append(row)
+                lengths.append(len(hourly['time_epoch']))
+                for field in HOURLY_FIELDS:
+                    columns[field].extend(hourly[field])
+
+        if not rows:
+            empty = np.empty((len(sites), 0), dtype=np.float32)
+            return cls(sites, 0, empty, empty, empty)
+
+        rows = np.repeat(np.asarray(rows, dtype=np.intp), lengths)
+        epochs = np.asarray(columns['time_epoch'], dtype=np.int64)
+        start = int(epochs.min()) // HOUR * HOUR
+        slots = (epochs - start) // HOUR
+
+        shape = (len(sites), int(slots.max()) + 1)
+        matrices = []
+        for field, scale in (('temp_c', 1.0), ('humidity', 1.0), ('wind_kph', 1 / 3.6)):  # kph -> m/s
+            matrix = np.full(shape, np.nan, dtype=np.float32)
+            matrix[rows, slots] = np.asarray(columns[field], dtype=np.float64) * scale
+            matrices.append(matrix)
+        return cls(sites, start, *matrices)
+
+    def to_state(self):
+        """JSON-safe form for the on-disk snapshot; matrices as raw float32 bytes so NaN gaps survive"""
+        state = {'sites': self.sites, 'start': self.start, 'shape': list(self.temp.shape)}
+        for field in ('temp', 'humidity', 'wind_speed'):
+            state[field] = base64.b64encode(getattr(self, field).astype(np.float32).tobytes()).decode('ascii')
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """Inverse of to_state; projections are recomputed rather than stored"""
+        shape = tuple(state['shape'])
+        matrices = [np.frombuffer(base64.b64decode(state[field]), dtype=np.float32).reshape(shape).copy()
+                    for field in ('temp', 'humidity', 'wind_speed')]
+        return cls(state['sites'], state['start'], *matrices)
+
+    def find(self, name, country=None):
+        """Row of a city by name (and country), or None"""
+        for row, site in enumerate(self.sites):
+            if site['name'].lower() == name.lower() and (country is None or site['country'].upper() == country.upper()):
+                return row
+        return None
+
+    def city_curve(self, row):
+        """Columnar hourly curve for one city, limited to hours it has a forecast for"""
+        covered = ~np.isnan(self.temp[row])
+        curve = {'time_epoch': self.epochs[covered].tolist()}
+        for field in ('temp', 'humidity', 'wind_speed') + PROJECTED_FIELDS:
+            curve[field] = round_half_even(getattr(self, field)[row][covered].astype(np.float64)).tolist()
+        return curve
+
+    def continent_curve(self, continent):
+        """Per-hour mean over a continent's cities and how many cities cover each hour"""
+        rows = self._by_continent.get(continent, [])
+        if not rows:
+            return None
+        covered = ~np.isnan(self.temp[rows])
+        reporting = covered.sum(axis=0)
+        hours = reporting > 0
+        curve = {'time_epoch': self.epochs[hours].tolist(), 'cities_reporting': reporting[hours].tolist()}
+        for field in ('temp',) + PROJECTED_FIELDS:
+            values = getattr(self, field)[rows].astype(np.float64)
+            totals = np.where(covered, values, 0.0).sum(axis=0)
+            curve[field] = round_half_even(totals[hours] / reporting[hours]).tolist()
+        return curve
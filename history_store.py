@@ -0,0 +1,281 @@
+import os
+import re
+import json
+import time
+import threading
+import unicodedata
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are then serialised within each process only
+    fcntl = None
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'history')
+DEFAULT_RAW_RETENTION = 7 * 86400        # Raw observations kept this long, then rolled into hours
+DEFAULT_HOURLY_RETENTION = 90 * 86400    # Hourly rows kept this long, then rolled into days
+DEFAULT_DAILY_RETENTION = 400 * 86400
+COMPACT_EVERY = 3600
+
+TIERS = ('daily', 'hourly', 'raw')       # Oldest first; tiers never overlap in time
+BUCKETS = {'hourly': 3600, 'daily': 86400}
+
+# One fixed-size little-endian row per observation or rolled-up bucket
+ROW = np.dtype([
+    ('ts', '<f8'),
+    ('temp', '<f4'),
+    ('temp_min', '<f4'),
+    ('temp_max', '<f4'),
+    ('humidity', '<f4'),
+    ('wind_speed', '<f4'),
+    ('heating_demand', '<f4'),
+    ('cooling_demand', '<f4'),
+    ('total_energy_index', '<f4'),
+    ('count', '<u4')
+])
+MEAN_FIELDS = ('temp', 'humidity', 'wind_speed', 'heating_demand', 'cooling_demand', 'total_energy_index')
+
+
+def site_key(name, country):
+    """Stable file-system safe id for a city, e.g. 'br-sao-paulo'"""
+    ascii_name = unicodedata.normalize('NFKD', f"{country}-{name}").encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '-', ascii_name.lower()).strip('-')
+
+
+def downsample(rows, bucket_seconds):
+    """Roll rows up into fixed time buckets with count-weighted means.
+
+    `rows` must be sorted by ts. Each output row keeps the bucket start as
+    ts, the min/max of temp_min/temp_max and the summed count.
+    """
+    if len(rows) == 0:
+        return np.empty(0, dtype=ROW)
+    buckets = np.floor(rows['ts'] / bucket_seconds) * bucket_seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = rows['count'].astype(np.float64)
+    totals = np.add.reduceat(counts, starts)
+
+    out = np.empty(len(starts), dtype=ROW)
+    out['ts'] = buckets[starts]
+    for field in MEAN_FIELDS:
+        out[field] = np.add.reduceat(rows[field] * counts, starts) / totals
+    out['temp_min'] = np.minimum.reduceat(rows['temp_min'], starts)
+    out['temp_max'] = np.maximum.reduceat(rows['temp_max'], starts)
+    out['count'] = totals
+    return out
+
+
+class HistoryStore:
+    """Append-only on-disk time series of city observations and energy metrics.
+
+    Every site has one flat binary file per tier (raw, hourly, daily) of
+    fixed-size ROW records in time order, so a range query is two binary
+    searches over a memory-mapped ts column. Compaction rolls raw rows
+    older than the raw retention into hourly rows and old hourly rows into
+    daily ones; each tier covers a disjoint, older span than the next.
+    Writers from every gunicorn worker serialise on one flock (where fcntl
+    exists; elsewhere only within the process).
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, raw_retention=DEFAULT_RAW_RETENTION,
+                 hourly_retention=DEFAULT_HOURLY_RETENTION, daily_retention=DEFAULT_DAILY_RETENTION):
+        self.directory = directory
+        self.retention = {'raw': raw_retention, 'hourly': hourly_retention, 'daily': daily_retention}
+        self._sites = None
+        self._last_compacted = 0
+        self._lock = threading.Lock()
+        for tier in TIERS:
+            os.makedirs(os.path.join(directory, tier), exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """Build a store from HISTORY_* environment variables; None when disabled"""
+        directory = os.getenv('HISTORY_DIR', DEFAULT_DIR)
+        if not directory:
+            return None
+        days = 86400
+        return cls(
+            directory,
+            raw_retention=float(os.getenv('HISTORY_RAW_DAYS', DEFAULT_RAW_RETENTION / days)) * days,
+            hourly_retention=float(os.getenv('HISTORY_HOURLY_DAYS', DEFAULT_HOURLY_RETENTION / days)) * days,
+            daily_retention=float(os.getenv('HISTORY_DAILY_DAYS', DEFAULT_DAILY_RETENTION / days)) * days
+        )
+
+    # --- files ---
+    def _path(self, tier, key):
+        return os.path.join(self.directory, tier, f"{key}.bin")
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self, tier, key):
+        path = self._path(tier, key)
+        try:
+            if os.path.getsize(path) < ROW.itemsize:
+                return np.empty(0, dtype=ROW)
+        except OSError:
+            return np.empty(0, dtype=ROW)
+        return np.memmap(path, dtype=ROW, mode='r')
+
+    def _last_ts(self, key):
+        path = self._path('raw', key)
+        try:
+            with open(path, 'rb') as f:
+                f.seek(-ROW.itemsize, os.SEEK_END)
+                return float(np.frombuffer(f.read(ROW.itemsize), dtype=ROW)['ts'][0])
+        except OSError:
+            return None
+
+    def _rewrite(self, tier, key, rows):
+        path = self._path(tier, key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(rows.tobytes())
+        os.replace(tmp_path, path)
+
+    def _append(self, tier, key, rows):
+        if len(rows):
+            with open(self._path(tier, key), 'ab') as f:
+                f.write(rows.tobytes())
+
+    # --- site index ---
+    def _sites_path(self):
+        return os.path.join(self.directory, 'sites.json')
+
+    def sites(self):
+        """{site_key: {'name', 'country', 'continent'}} for every recorded city"""
+        if self._sites is None:
+            try:
+                with open(self._sites_path(), encoding='utf-8') as f:
+                    self._sites = json.load(f)
+            except (OSError, ValueError):
+                self._sites = {}
+        return self._sites
+
+    def _register(self, key, name, country, continent):
+        sites = self.sites()
+        if key in sites:
+            return False
+        sites[key] = {'name': name, 'country': country, 'continent': continent}
+        return True
+
+    # --- writes ---
+    def record(self, observations):
+        """Append observations: dicts with name, country, continent, ts and ROW metric fields.
+
+        An observation whose ts is not newer than the site's last raw row
+        is skipped, so several workers recording the same snapshot, or a
+        rebuild served from cache, never write duplicates.
+        """
+        with self._lock, self._locked():
+            self._sites = None  # Another worker may have registered sites
+            registered = False
+            for obs in observations:
+                key = site_key(obs['name'], obs['country'])
+                last = self._last_ts(key)
+                if last is not None and obs['ts'] <= last:
+                    continue
+                row = np.zeros(1, dtype=ROW)
+                for field in ('ts',) + MEAN_FIELDS:
+                    row[field] = obs[field]
+                row['temp_min'] = row['temp_max'] = obs['temp']
+                row['count'] = 1
+                self._append('raw', key, row)
+                registered |= self._register(key, obs['name'], obs['country'], obs['continent'])
+            if registered:
+                tmp_path = f"{self._sites_path()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._sites, f, ensure_ascii=False)
+                os.replace(tmp_path, self._sites_path())
+
+        if time.time() - self._last_compacted > COMPACT_EVERY:
+            self.compact()
+
+    def compact(self, now=None):
+        """Roll aged raw rows into hours, aged hours into days, and drop expired days"""
+        now = now or time.time()
+        self._last_compacted = now
+        with self._lock, self._locked():
+            for key in self.sites():
+                for finer, coarser in (('raw', 'hourly'), ('hourly', 'daily')):
+                    bucket = BUCKETS[coarser]
+                    # Only whole buckets move, so a bucket never straddles two tiers
+                    cutoff = np.floor((now - self.retention[finer]) / bucket) * bucket
+                    rows = np.array(self._read(finer, key))
+                    split = np.searchsorted(rows['ts'], cutoff, side='left')
+                    if split == 0:
+                        continue
+                    self._append(coarser, key, downsample(rows[:split], bucket))
+                    self._rewrite(finer, key, rows[split:])
+
+                rows = np.array(self._read('daily', key))
+                split = np.searchsorted(rows['ts'], now - self.retention['daily'], side='left')
+                if split:
+                    self._rewrite('daily', key, rows[split:])
+
+    # --- reads ---
+    def series(self, key, start, end):
+        """All stored rows for one site with start <= ts < end, oldest first"""
+        parts = []
+        for tier in TIERS:
+            rows = self._read(tier, key)
+            if len(rows) == 0:
+                continue
+            ts = rows['ts']
+            lo = np.searchsorted(ts, start, side='left')
+            hi = np.searchsorted(ts, end, side='left')
+            if hi > lo:
+                parts.append(np.array(rows[lo:hi]))
+        if not parts:
+            return np.empty(0, dtype=ROW)
+        return np.concatenate(parts)
+
+    def keys(self, name=None, country=None, continent=None):
+        """Site keys matching a city name, country and/or continent"""
+        return [
+            key for key, site in self.sites().items()
+            if (name is None or site['name'].lower() == name.lower())
+            and (country is None or site['country'].upper() == country.upper())
+            and (continent is None or site['continent'] == continent)
+        ]
+
+    def query(self, start, end, name=None, country=None, continent=None, resolution='auto'):
+        """Range query for a city, country or continent.
+
+        One site comes back at its stored resolution ('auto') or rolled up
+        to 'hourly'/'daily'. Several sites are merged into one series,
+        bucketed hourly unless 'daily' is asked for.
+        """
+        keys = self.keys(name, country, continent)
+        rows = [self.series(key, start, end) for key in keys]
+        rows = [r for r in rows if len(r)]
+        if not rows:
+            return keys, np.empty(0, dtype=ROW)
+
+        if len(rows) == 1 and resolution in ('auto', 'raw'):
+            return keys, rows[0]
+
+        merged = np.concatenate(rows)
+        merged = merged[np.argsort(merged['ts'], kind='stable')]
+        bucket = BUCKETS['daily' if resolution == 'daily' else 'hourly']
+        return keys, downsample(merged, bucket)
+
+
+def rows_to_columns(rows):
+    """Columnar JSON-ready dict: one list per field, rounded for transport"""
+    columns = {'ts': rows['ts'].astype(np.int64).tolist()}
+    for field in ROW.names[1:]:
+        values = rows[field]
+        columns[field] = values.tolist() if field == 'count' else np.round(values.astype(np.float64), 2).tolist()
+    return columns
@@ -0,0 +1,166 @@
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+from flask import Response, request
+
+import compact
+
+try:
+    import brotli
+except ImportError:  # Optional: without it we negotiate gzip only
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder is the fallback
+    orjson = None
+
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def encode_json(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+
+# Representations a route may offer: name -> (mimetype, payload -> bytes)
+FORMATS = {
+    'json': ('application/json', encode_json),
+    'columnar': ('application/vnd.enerwe.columnar+json', lambda payload: encode_json(compact.columnar(payload))),
+    'msgpack': ('application/x-msgpack', compact.pack),
+    # Pre-rendered pages; the payload is the rendered text
+    'html': ('text/html', lambda page: page.encode('utf-8'))
+}
+API_FORMATS = ('json', 'columnar', 'msgpack')
+
+
+def available_formats():
+    return [name for name in API_FORMATS if name != 'msgpack' or compact.msgpack is not None]
+
+
+class EncodedBody:
+    """One JSON payload serialized once, with lazily built compressed variants.
+
+    The ETag is a hash of the identity body, so two snapshots with the
+    same content share it. It is weak because gzip/br variants carry the
+    same ETag, which is allowed for semantically equivalent representations.
+    """
+
+    __slots__ = ('body', 'etag', 'last_modified', 'mimetype', '_variants', '_lock', '_timer')
+
+    def __init__(self, payload, last_modified, timer=None, fmt='json'):
+        self._timer = timer or (lambda stage: nullcontext())
+        self.mimetype, encode = FORMATS[fmt]
+        with self._timer('serialize'):
+            self.body = encode(payload)
+        self.etag = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+        self.last_modified = datetime.fromtimestamp(int(last_modified), timezone.utc)
+        self._variants = {'identity': self.body}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """Body in the given content-coding, compressed at most once"""
+        variant = self._variants.get(encoding)
+        if variant is None:
+            with self._lock:
+                variant = self._variants.get(encoding)
+                if variant is None:
+                    with self._timer('compress'):
+                        if encoding == 'br':
+                            variant = brotli.compress(self.body, quality=BROTLI_QUALITY)
+                        else:
+                            variant = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+                    self._variants[encoding] = variant
+        return variant
+
+
+class ResponseCache:
+    """EncodedBody per route key, rebuilt only when the source version changes.
+
+    When a new version serializes to the same bytes as the previous one the
+    old EncodedBody is kept, so Last-Modified marks when the content last
+    changed and already-compressed variants are reused. `timer(stage)`, if
+    given, returns a context manager timing 'serialize' and 'compress'.
+    """
+
+    def __init__(self, maxsize=256, timer=None):
+        self.maxsize = maxsize
+        self.timer = timer
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, last_modified, build_payload, fmt='json'):
+        if fmt != 'json':
+            key = f'{key}@{fmt}'
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        encoded = EncodedBody(build_payload(), last_modified, self.timer, fmt)
+        if entry is not None and entry[1].etag == encoded.etag:
+            encoded = entry[1]
+        with self._lock:
+            self._entries[key] = (version, encoded)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return encoded
+
+
+def negotiate_encoding(size):
+    """Best content-coding the client accepts for a body of `size` bytes"""
+    if size < MIN_COMPRESS_BYTES:
+        return 'identity'
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return 'identity'
+
+
+def negotiate_format():
+    """Representation asked for by ?format= or else Accept; None if ?format= names one we can't produce.
+
+    Accept only picks a compact format when the client ranks it above
+    JSON, so browsers sending */* keep getting plain JSON.
+    """
+    available = available_formats()
+    requested = request.args.get('format')
+    if requested:
+        return requested if requested in available else None
+    best = request.accept_mimetypes.best_match([FORMATS[name][0] for name in available], default='application/json')
+    return next(name for name in available if FORMATS[name][0] == best)
+
+
+def conditional_json_response(encoded, headers=None):
+    """Serve an EncodedBody with ETag/Last-Modified, answering 304 when the client is current"""
+    common = {
+        'ETag': f'W/"{encoded.etag}"',
+        'Last-Modified': encoded.last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT'),
+        # Clients may keep the body but must revalidate before each reuse
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding'
+    }
+    common.update(headers or {})
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(encoded.etag)
+    else:
+        since = request.if_modified_since
+        not_modified = since is not None and encoded.last_modified <= since
+    if not_modified:
+        return Response(status=304, headers=common)
+
+    encoding = negotiate_encoding(len(encoded.body))
+    response = Response(encoded.encoded(encoding), mimetype=encoded.mimetype, headers=common)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,282 @@
+import os
+import re
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+
+DEFAULT_TIMEOUT = (3.05, 10)   # (connect, read) seconds
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.3          # Base of the exponential backoff, in seconds
+DEFAULT_BACKOFF_JITTER = 0.3   # Up to this many random seconds added per retry
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET = 30
+MAX_RETRY_AFTER = 1.0          # Longest Retry-After we sleep for before a retry, in seconds
+
+# Only idempotent requests are retried, and only on statuses that signal a
+# transient provider problem; 4xx answers, 429 included, are final and left
+# to the caller (a throttled key is benched by KeyPool rather than re-hit)
+RETRY_METHODS = frozenset(['GET', 'HEAD'])
+RETRY_STATUSES = (500, 502, 503, 504)
+
+API_KEY_PARAM = re.compile(r'(?i)\b(key=)[^&\s\'"]+')
+
+
+def redact(error):
+    """Text of an exception or URL with any key= query value masked, for logs"""
+    return API_KEY_PARAM.sub(r'\1…', str(error))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream host.
+
+    closed: calls flow, failures are counted.
+    open: after `threshold` consecutive failures every call fails fast for
+    `reset_timeout` seconds instead of waiting on a degraded provider.
+    half-open: once that time has passed a single trial call is let
+    through; success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, threshold=DEFAULT_BREAKER_THRESHOLD, reset_timeout=DEFAULT_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Whether a call may go out right now"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self):
+        """Give back a half-open trial that was abandoned before any answer, so the next call gets one"""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class PooledHTTPClient:
+    """Keep-alive session pool with retries and per-host circuit breakers.
+
+    One requests.Session per worker process keeps connections to the
+    provider open between calls; its pool is sized to the fetch
+    concurrency so parallel fetches never queue for a socket.
+    """
+
+    def __init__(self, pool_size=10, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, backoff_jitter=DEFAULT_BACKOFF_JITTER,
+                 breaker_threshold=DEFAULT_BREAKER_THRESHOLD, breaker_reset=DEFAULT_BREAKER_RESET):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_jitter = backoff_jitter
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._breakers = {}
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, pool_size):
+        """Build a client from HTTP_* environment variables"""
+        return cls(
+            pool_size=pool_size,
+            timeout=(float(os.getenv('HTTP_CONNECT_TIMEOUT', DEFAULT_TIMEOUT[0])),
+                     float(os.getenv('HTTP_READ_TIMEOUT', DEFAULT_TIMEOUT[1]))),
+            retries=int(os.getenv('HTTP_RETRIES', DEFAULT_RETRIES)),
+            backoff=float(os.getenv('HTTP_BACKOFF', DEFAULT_BACKOFF)),
+            backoff_jitter=float(os.getenv('HTTP_BACKOFF_JITTER', DEFAULT_BACKOFF_JITTER)),
+            breaker_threshold=int(os.getenv('HTTP_BREAKER_THRESHOLD', DEFAULT_BREAKER_THRESHOLD)),
+            breaker_reset=float(os.getenv('HTTP_BREAKER_RESET', DEFAULT_BREAKER_RESET))
+        )
+
+    @property
+    def session(self):
+        # Pooled sockets must not be shared across a gunicorn fork
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    self._session = self._build_session()
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def _build_session(self):
+        # Imported on first use: only the background crawl talks to the provider, so a
+        # freshly booted worker can serve its stored snapshot without loading them
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        class CappedRetry(Retry):
+            # urllib3 would also retry 413/429 that carry Retry-After, and sleep as long as asked
+            RETRY_AFTER_STATUS_CODES = frozenset(RETRY_STATUSES)
+
+            def get_retry_after(self, response):
+                seconds = super().get_retry_after(response)
+                return None if seconds is None else min(seconds, MAX_RETRY_AFTER)
+
+        retry = CappedRetry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=self.backoff,
+            backoff_jitter=self.backoff_jitter,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def breaker(self, host):
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            return self._breakers[host]
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the pool, guarded by the host's breaker.
+
+        Connection errors, timeouts and 5xx answers (after retries) count as
+        breaker failures; anything else, including 4xx, counts as success
+        since the host itself is healthy.
+        """
+        breaker = self.breaker(urlsplit(url).netloc)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc}")
+
+        kwargs.setdefault('timeout', self.timeout)
+        session = self.session
+        import requests  # Cheap here, _build_session loaded it
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def breaker_states(self):
+        """Current breaker state per upstream host"""
+        with self._lock:
+            return {host: {'state': b.state, 'failures': b.failures} for host, b in self._breakers.items()}
+
+
+class AsyncPooledHTTPClient:
+    """asyncio counterpart of PooledHTTPClient for the async serving mode.
+
+    One httpx.AsyncClient per event loop keeps `pool_size` keep-alive
+    connections. Retries, backoff and the per-host circuit breakers follow
+    the sync client's, and the breakers are shared with it, so both modes
+    see the same host health.
+    """
+
+    def __init__(self, sync_client, pool_size):
+        try:
+            import httpx
+        except ImportError:  # Optional: only the async serving mode (asgi.py) needs it
+            raise RuntimeError("The async serving mode needs httpx: pip install httpx")
+        self.transport_errors = httpx.HTTPError
+        self.sync_client = sync_client
+        connect, read = sync_client.timeout
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+        return self.sync_client.backoff * (2 ** attempt) + random.uniform(0, self.sync_client.backoff_jitter)
+
+    async def request(self, method, url, **kwargs):
+        """Send a request, retrying idempotent calls on transport errors and 5xx"""
+        breaker = self.sync_client.breaker(urlsplit(url).netloc)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc}")
+
+        import asyncio  # Only the async serving mode pays for it
+
+        # Allowed while not closed means this call is the half-open trial
+        trial = breaker.state != 'closed'
+        attempts = 1 + (self.sync_client.retries if method in RETRY_METHODS else 0)
+        try:
+            for attempt in range(attempts):
+                last = attempt == attempts - 1
+                try:
+                    response = await self._client.request(method, url, **kwargs)
+                except self.transport_errors:
+                    if last:
+                        breaker.record_failure()
+                        raise
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                if response.status_code in RETRY_STATUSES and not last:
+                    await asyncio.sleep(self._backoff(attempt, response))
+                    continue
+                break
+        except asyncio.CancelledError:
+            # Cancelled by a caller's deadline, which says nothing about the host; a trial left
+            # marked in flight would keep the breaker shut for good, in both serving modes
+            if trial:
+                breaker.release()
+            raise
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def aclose(self):
+        await self._client.aclose()
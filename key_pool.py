@@ -0,0 +1,257 @@
+import os
+import time
+import atexit
+import sqlite3
+import hashlib
+import calendar
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+DEFAULT_BUDGET = 1000000  # WeatherAPI's free plan allows 1M calls a month
+DEFAULT_PERIOD = 'month'
+DEFAULT_COOLDOWN = 60  # Seconds a key sits out after a 429
+DEFAULT_SYNC_INTERVAL = 5  # Seconds between merging call counts with the other workers
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'enerwe-api-keys.sqlite3')
+PERIODS = ('day', 'month')
+
+
+def period_bounds(period, now):
+    """(label, end epoch) of the day or month containing `now`, in UTC"""
+    moment = datetime.fromtimestamp(now, timezone.utc)
+    if period == 'day':
+        start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        return start.strftime('%Y-%m-%d'), start.timestamp() + 86400
+    days = calendar.monthrange(moment.year, moment.month)[1]
+    start = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return start.strftime('%Y-%m'), start.timestamp() + days * 86400
+
+
+def mask_key(key):
+    """Enough of a key to tell it apart on a status page"""
+    return f"{key[:4]}…{key[-4:]}" if len(key) > 12 else '…'
+
+
+class _Key:
+    __slots__ = ('key', 'key_id', 'budget', 'calls', 'pending', 'quarantined_until', 'reason', 'bulk')
+
+    def __init__(self, key, budget):
+        self.key = key
+        # Only this hash is written to disk
+        self.key_id = hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+        self.budget = budget
+        self.calls = 0
+        self.pending = 0  # Calls not yet added to the shared counters
+        self.quarantined_until = 0.0
+        self.reason = None
+        self.bulk = True  # Until the provider says this key's plan has no bulk requests
+
+
+class KeyPool:
+    """Several WeatherAPI keys, each with a call budget per day or month.
+
+    acquire() hands out the healthy key that has used the smallest share
+    of its budget and counts the call against it. report() takes a key out
+    of rotation on 401/403 (invalid, disabled or out of quota; back when
+    the period rolls over) or 429 (back after `cooldown` seconds, and
+    still used while no other key is healthy). Counts and quarantines
+    live in a SQLite file shared by every worker on the host and
+    surviving restarts; each worker merges its own counts into it every
+    `sync_interval` seconds, so usage may lag that long between workers.
+    Pass path=None to keep everything in process.
+    """
+
+    def __init__(self, keys, period=DEFAULT_PERIOD, path=DEFAULT_PATH, cooldown=DEFAULT_COOLDOWN,
+                 sync_interval=DEFAULT_SYNC_INTERVAL):
+        if period not in PERIODS:
+            raise ValueError(f"Unknown budget period {period!r}, use one of: {', '.join(PERIODS)}")
+        self.period = period
+        self.path = path
+        self.cooldown = cooldown
+        self.sync_interval = sync_interval
+        self._keys = {key: _Key(key, budget) for key, budget in keys}
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._label, self._period_end = period_bounds(period, time.time())
+        self._next_sync = 0.0
+        if self._keys:
+            atexit.register(self.flush)
+
+    @classmethod
+    def from_env(cls):
+        """Keys from WEATHER_API_KEYS ("key[:budget],...") or WEATHER_API_KEY, plus WEATHER_API_KEY_* settings"""
+        budget = int(os.getenv('WEATHER_API_KEY_BUDGET', DEFAULT_BUDGET))
+        keys = []
+        for entry in (os.getenv('WEATHER_API_KEYS') or os.getenv('WEATHER_API_KEY') or '').split(','):
+            key, _, key_budget = entry.strip().partition(':')
+            if key:
+                keys.append((key, int(key_budget) if key_budget else budget))
+        path = os.getenv('WEATHER_API_KEY_DB', DEFAULT_PATH)
+        return cls(
+            keys,
+            period=os.getenv('WEATHER_API_KEY_PERIOD', DEFAULT_PERIOD),
+            path=path or None,
+            cooldown=float(os.getenv('WEATHER_API_KEY_COOLDOWN', DEFAULT_COOLDOWN)),
+            sync_interval=float(os.getenv('WEATHER_API_KEY_SYNC', DEFAULT_SYNC_INTERVAL))
+        )
+
+    def __len__(self):
+        return len(self._keys)
+
+    # --- shared counters ---
+    def _shared(self):
+        # Connections must not cross a fork, so reopen per worker process
+        if self.path is None:
+            return None
+        if self._conn is None or self._conn_pid != os.getpid():
+            try:
+                conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS api_key_usage ('
+                    'key_id TEXT, period TEXT, calls INTEGER, PRIMARY KEY (key_id, period))'
+                )
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS api_key_quarantine (key_id TEXT PRIMARY KEY, until REAL, reason TEXT)'
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"API key usage kept in process only: {e}")
+                self.path = None
+                return None
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _sync(self, now):
+        """Push pending counts, roll the period over if it ended, then pull everyone's totals"""
+        conn = self._shared()
+        try:
+            if conn is not None:
+                conn.executemany(
+                    'INSERT INTO api_key_usage (key_id, period, calls) VALUES (?, ?, ?) '
+                    'ON CONFLICT (key_id, period) DO UPDATE SET calls = calls + excluded.calls',
+                    [(entry.key_id, self._label, entry.pending) for entry in self._keys.values() if entry.pending]
+                )
+                conn.commit()
+            for entry in self._keys.values():
+                entry.pending = 0
+
+            label, self._period_end = period_bounds(self.period, now)
+            if label != self._label:
+                self._label = label
+                for entry in self._keys.values():
+                    entry.calls = 0
+            if conn is not None:
+                by_id = {entry.key_id: entry for entry in self._keys.values()}
+                for key_id, calls in conn.execute('SELECT key_id, calls FROM api_key_usage WHERE period = ?', (label,)):
+                    if key_id in by_id:
+                        by_id[key_id].calls = calls
+                for key_id, until, reason in conn.execute('SELECT key_id, until, reason FROM api_key_quarantine'):
+                    entry = by_id.get(key_id)
+                    if entry is not None and until > entry.quarantined_until:
+                        entry.quarantined_until, entry.reason = until, reason
+        except sqlite3.Error as e:
+            print(f"API key usage sync failed: {e}")
+        self._next_sync = now + self.sync_interval
+
+    def flush(self):
+        """Write pending counts to the shared file"""
+        with self._lock:
+            self._sync(time.time())
+
+    # --- public API ---
+    def acquire(self, cost=1, bulk=False):
+        """Least-used healthy key with `cost` calls of budget left (and bulk access if asked), counted as spent.
+
+        None if there is no such key.
+        """
+        now = time.time()
+        with self._lock:
+            if now >= self._next_sync or now >= self._period_end:
+                self._sync(now)
+            usable = [entry for entry in self._keys.values()
+                      if entry.calls + cost <= entry.budget and (entry.bulk or not bulk)]
+            healthy = [entry for entry in usable if entry.quarantined_until <= now]
+            # A throttled key beats no key at all: a 429 is about pace, not the key itself
+            candidates = healthy or [entry for entry in usable if entry.reason == 'http_429']
+            if not candidates:
+                return None
+            best = min(candidates, key=lambda entry: entry.calls / entry.budget)
+            best.calls += cost
+            best.pending += cost
+            return best.key
+
+    def refund(self, key, cost=1):
+        """Give back what acquire() charged for a call that never reached the provider"""
+        entry = self._keys.get(key)
+        if entry is None:
+            return
+        with self._lock:
+            entry.calls = max(0, entry.calls - cost)
+            # May go negative if a sync ran in between; the next one then subtracts it from the shared count
+            entry.pending -= cost
+
+    def report(self, key, status_code):
+        """Take the key out of rotation if the provider refused it"""
+        if status_code not in (401, 403, 429):
+            return
+        entry = self._keys.get(key)
+        if entry is None:
+            return
+        now = time.time()
+        with self._lock:
+            until = now + self.cooldown if status_code == 429 else self._period_end
+            if until <= entry.quarantined_until:
+                return
+            entry.quarantined_until, entry.reason = until, f'http_{status_code}'
+            print(f"API key {mask_key(key)} out of rotation until "
+                  f"{datetime.fromtimestamp(until, timezone.utc).isoformat()} ({entry.reason})")
+            conn = self._shared()
+            if conn is None:
+                return
+            try:
+                conn.execute('INSERT OR REPLACE INTO api_key_quarantine (key_id, until, reason) VALUES (?, ?, ?)',
+                             (entry.key_id, until, entry.reason))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"API key quarantine not shared: {e}")
+
+    def disable_bulk(self, key):
+        """Stop handing out this key for bulk calls in this process; it keeps serving single ones"""
+        entry = self._keys.get(key)
+        if entry is not None and entry.bulk:
+            entry.bulk = False
+            print(f"Bulk requests unavailable for API key {mask_key(key)}, using single-location fetches with it")
+
+    def bulk_available(self):
+        return any(entry.bulk for entry in self._keys.values())
+
+    def stats(self):
+        """Usage per key with the keys masked, for the admin endpoint"""
+        now = time.time()
+        with self._lock:
+            self._sync(now)
+            keys = []
+            for entry in self._keys.values():
+                quarantined = entry.quarantined_until > now
+                keys.append({
+                    'key': mask_key(entry.key),
+                    'calls': entry.calls,
+                    'budget': entry.budget,
+                    'remaining': max(0, entry.budget - entry.calls),
+                    'used': round(entry.calls / entry.budget, 4) if entry.budget else 1,
+                    'healthy': not quarantined and entry.calls < entry.budget,
+                    'bulk': entry.bulk,
+                    'quarantined_until': datetime.fromtimestamp(entry.quarantined_until, timezone.utc).isoformat()
+                                         if quarantined else None,
+                    'reason': entry.reason if quarantined else None
+                })
+            return {
+                'period': self.period,
+                'current_period': self._label,
+                'resets_at': datetime.fromtimestamp(self._period_end, timezone.utc).isoformat(),
+                'shared': self.path is not None,
+                'keys': keys
+            }
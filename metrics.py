@@ -0,0 +1,249 @@
+import os
+import json
+import glob
+import time
+import threading
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_FLUSH_INTERVAL = 5
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dump(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    @staticmethod
+    def merge(into, value):
+        return (into or 0) + value
+
+    def render(self, values):
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+
+
+class Histogram:
+    """Bucketed distribution per label combination, e.g. latencies in seconds"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket (not cumulative) counts, the last one is +Inf, then sum
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def time(self, **labels):
+        """Context manager observing the wall time of its with-block"""
+        return _Timer(self, labels)
+
+    def dump(self):
+        with self._lock:
+            return [[list(key), list(entry)] for key, entry in self._values.items()]
+
+    @staticmethod
+    def merge(into, value):
+        return value if into is None else [a + b for a, b in zip(into, value)]
+
+    def render(self, values):
+        for key, entry in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{format_labels(self.labelnames, key, [('le', format_value(bound))])} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, key)} {format_value(entry[-1])}"
+            yield f"{self.name}_count{format_labels(self.labelnames, key)} {cumulative}"
+
+
+class _Timer:
+    # A plain class rather than @contextmanager: this sits on every hot-path stage
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Gauge:
+    """Point-in-time values read from a callback at scrape time: {label tuple: value}"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), read=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._read = read
+
+    def dump(self):
+        return [[list(key), value] for key, value in (self._read() if self._read else {}).items()]
+
+    @staticmethod
+    def merge(into, value):
+        return (into or 0) + value
+
+    def render(self, values):
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+
+
+class MetricsRegistry:
+    """Process-local metrics with optional aggregation across gunicorn workers.
+
+    Recording is an in-memory update under a per-metric lock, so it is cheap
+    enough for the hot path. Without a directory `/metrics` shows the
+    worker that served the scrape. With one, every worker writes its
+    values to <directory>/<pid>.json every few seconds and the scrape sums
+    all files, including those of exited workers so counters never go
+    backwards. Clear the directory when deploying.
+    """
+
+    def __init__(self, directory=None, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._pid = None
+        self._start_lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """Registry configured from METRICS_DIR / METRICS_FLUSH_INTERVAL"""
+        return cls(
+            directory=os.getenv('METRICS_DIR') or None,
+            flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL))
+        )
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames=(), read=None):
+        return self._register(Gauge(name, documentation, labelnames, read))
+
+    # --- cross-worker files ---
+    def start(self):
+        """Start the per-process flush thread when a directory is configured"""
+        if not self.directory or self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='metrics-flush', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def dump(self):
+        # Gauges describe the live process only, so they are not persisted
+        return {name: metric.dump() for name, metric in self._metrics.items() if metric.kind != 'gauge'}
+
+    def flush(self):
+        """Write this process's values for other workers' scrapes"""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.dump(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Metrics flush failed: {e}")
+
+    def _collect(self):
+        """{metric name: {label tuple: merged value}} over every worker's dump"""
+        dumps = [self.dump()]
+        if self.directory:
+            self.flush()
+            dumps = []
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        dumps.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        dumps.append({name: metric.dump() for name, metric in self._metrics.items() if metric.kind == 'gauge'})
+
+        merged = {name: {} for name in self._metrics}
+        for dump in dumps:
+            for name, values in dump.items():
+                metric = self._metrics.get(name)
+                if metric is None:
+                    continue
+                for key, value in values:
+                    key = tuple(key)
+                    merged[name][key] = metric.merge(merged[name].get(key), value)
+        return merged
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, values in self._collect().items():
+            metric = self._metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(values))
+        return '\n'.join(lines) + '\n'
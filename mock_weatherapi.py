@@ -0,0 +1,330 @@
+"""Local stand-in for the WeatherAPI.com forecast.json / current.json endpoints.
+
+Serves realistic, reproducible payloads in the exact shape the dashboard
+parses, with injectable latency, 5xx errors, 429 throttling and bulk
+requests, so the fetch path can be load-tested offline:
+
+    python mock_weatherapi.py --port 5055 --latency lognormal:80:0.5 --error-rate 0.02
+    WEATHER_API_BASE_URL=http://127.0.0.1:5055/v1 gunicorn app:app
+
+Every option can also be set through the MOCK_WEATHERAPI_* environment
+variable of the same name (e.g. MOCK_WEATHERAPI_ERROR_RATE=0.02).
+"""
+import os
+import math
+import time
+import random
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask, jsonify, request
+
+from fetch_engine import TokenBucket
+
+CONDITIONS = [
+    # (text, code, icon number); index 0..1 dry, 2..3 cloudy, 4..5 wet
+    ('Sunny', 1000, 113),
+    ('Partly cloudy', 1003, 116),
+    ('Cloudy', 1006, 119),
+    ('Overcast', 1009, 122),
+    ('Light rain', 1183, 296),
+    ('Moderate rain', 1189, 302)
+]
+ERRORS = {
+    'missing_key': (401, 1002, 'API key is invalid or not provided.'),
+    'bad_query': (400, 1006, 'No location found matching parameter \'q\''),
+    'throttled': (429, 2007, 'API key has exceeded calls per month quota.'),
+    'internal': (500, 9999, 'Internal application error.')
+}
+
+
+class LatencyModel:
+    """Per-request delay drawn from a named distribution, in milliseconds.
+
+    Specs: 'none', 'fixed:MS', 'uniform:LOW:HIGH', 'exponential:MEAN',
+    'lognormal:MEDIAN:SIGMA'.
+    """
+
+    def __init__(self, spec='none'):
+        name, *params = spec.split(':')
+        self.spec = spec
+        self.name = name
+        self.params = [float(p) for p in params]
+        if name not in ('none', 'fixed', 'uniform', 'exponential', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng):
+        """Delay in seconds"""
+        if self.name == 'fixed':
+            ms = self.params[0]
+        elif self.name == 'uniform':
+            ms = rng.uniform(*self.params)
+        elif self.name == 'exponential':
+            ms = rng.expovariate(1 / self.params[0])
+        elif self.name == 'lognormal':
+            median, sigma = self.params
+            ms = rng.lognormvariate(math.log(median), sigma)
+        else:
+            ms = 0
+        return ms / 1000
+
+
+def base_temperature(lat, day_of_year):
+    """Seasonal daily mean: warm near the equator, colder and more seasonal toward the poles"""
+    season = math.cos(2 * math.pi * (day_of_year - 196) / 365) * (1 if lat >= 0 else -1)
+    return 27 - 0.3 * abs(lat) + season * abs(lat) * 0.25
+
+
+class WeatherGenerator:
+    """Deterministic WeatherAPI-shaped payloads for any coordinate.
+
+    Values depend only on the seed, the coordinates and the current
+    refresh window, so two runs with the same seed and clock agree, and
+    data changes every `refresh` seconds like a real provider's.
+    """
+
+    def __init__(self, seed=0, refresh=900, days=3, cache_size=4096):
+        self.seed = seed
+        self.refresh = refresh
+        self.days = days
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _rng(self, lat, lon, *salt):
+        return random.Random(f"{self.seed}:{lat:.4f}:{lon:.4f}:" + ':'.join(str(s) for s in salt))
+
+    def _condition(self, rng, humidity):
+        band = 4 if humidity > 80 else 2 if humidity > 60 else 0
+        text, code, icon = CONDITIONS[band + rng.randint(0, 1)]
+        return {'text': text, 'icon': f"//cdn.weatherapi.com/weather/64x64/day/{icon}.png", 'code': code}
+
+    def _hour(self, rng, lat, local_time, daily_mean, daily_swing):
+        # Coldest around 05:00, warmest around 15:00 local time
+        phase = math.cos(2 * math.pi * (local_time.hour - 15) / 24)
+        temp = round(daily_mean + daily_swing * phase + rng.gauss(0, 0.8), 1)
+        humidity = max(10, min(100, round(70 - 20 * phase + rng.gauss(0, 8))))
+        wind_kph = round(abs(rng.gauss(12 + abs(lat) * 0.1, 6)), 1)
+        return temp, humidity, wind_kph
+
+    def forecast(self, lat, lon, days=None, now=None):
+        """forecast.json body for one location.
+
+        Payloads only change per refresh window, so they are built once per
+        window and served from an LRU; a load test then measures the app,
+        not the generator.
+        """
+        window_start = (now or time.time()) // self.refresh * self.refresh
+        key = (lat, lon, days, window_start)
+        with self._lock:
+            payload = self._cache.get(key)
+            if payload is not None:
+                self._cache.move_to_end(key)
+                return payload
+        payload = self._build(lat, lon, days, window_start)
+        with self._lock:
+            self._cache[key] = payload
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return payload
+
+    def _build(self, lat, lon, days, now):
+        window = int(now // self.refresh)
+        offset = timedelta(hours=round(lon / 15))  # Solar time zone, good enough for a stand-in
+        local_now = datetime.fromtimestamp(now, timezone.utc) + offset
+        midnight = local_now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        forecastday = []
+        current = None
+        for day in range(max(1, min(days or self.days, 14))):
+            date = midnight + timedelta(days=day)
+            day_rng = self._rng(lat, lon, date.date())
+            daily_mean = base_temperature(lat, date.timetuple().tm_yday) + day_rng.gauss(0, 3)
+            daily_swing = day_rng.uniform(3, 7)
+            hours = []
+            for hour in range(24):
+                local_time = date + timedelta(hours=hour)
+                epoch = int((local_time - offset).timestamp())
+                temp, humidity, wind_kph = self._hour(self._rng(lat, lon, epoch // 3600, window), lat,
+                                                      local_time, daily_mean, daily_swing)
+                hours.append({
+                    'time_epoch': epoch,
+                    'time': local_time.strftime('%Y-%m-%d %H:%M'),
+                    'temp_c': temp,
+                    'feelslike_c': round(temp - wind_kph / 20, 1),
+                    'humidity': humidity,
+                    'wind_kph': wind_kph,
+                    'pressure_mb': 1013.0,
+                    'condition': self._condition(day_rng, humidity)
+                })
+                if current is None and local_time.hour == local_now.hour and day == 0:
+                    current = dict(hours[-1])
+            temps = [h['temp_c'] for h in hours]
+            forecastday.append({
+                'date': date.strftime('%Y-%m-%d'),
+                'date_epoch': int((date - offset).timestamp()),
+                'day': {
+                    'maxtemp_c': max(temps),
+                    'mintemp_c': min(temps),
+                    'avgtemp_c': round(sum(temps) / 24, 1),
+                    'avghumidity': round(sum(h['humidity'] for h in hours) / 24),
+                    'maxwind_kph': max(h['wind_kph'] for h in hours),
+                    'condition': hours[12]['condition']
+                },
+                'hour': hours
+            })
+
+        payload = self.current(lat, lon, now, current, local_now)
+        payload['forecast'] = {'forecastday': forecastday}
+        return payload
+
+    def current(self, lat, lon, now, hour, local_now):
+        """current.json body built from the matching forecast hour"""
+        updated = int(now // self.refresh * self.refresh)
+        return {
+            'location': {
+                'name': f"{lat:.2f},{lon:.2f}",
+                'lat': lat,
+                'lon': lon,
+                'tz_id': 'Etc/GMT' if round(lon / 15) == 0 else f"Etc/GMT{-round(lon / 15):+d}",
+                'localtime_epoch': int(now),
+                'localtime': local_now.strftime('%Y-%m-%d %H:%M')
+            },
+            'current': {
+                'last_updated_epoch': updated,
+                'temp_c': hour['temp_c'],
+                'feelslike_c': hour['feelslike_c'],
+                'humidity': hour['humidity'],
+                'pressure_mb': hour['pressure_mb'],
+                'wind_kph': hour['wind_kph'],
+                'condition': hour['condition']
+            }
+        }
+
+
+def parse_query(q):
+    """'lat,lon' -> (lat, lon), or None for anything else"""
+    try:
+        lat, lon = (float(part) for part in q.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        return None
+    return lat, lon
+
+
+def create_app(seed=0, latency='none', error_rate=0.0, throttle_rate=0.0, rate_limit=0.0, refresh=900):
+    """Flask app serving /v1/forecast.json, /v1/current.json and /_stats"""
+    mock = Flask(__name__)
+    generator = WeatherGenerator(seed=seed, refresh=refresh)
+    latency_model = LatencyModel(latency)
+    limiter = TokenBucket(rate_limit, max(1, rate_limit)) if rate_limit else None
+    rng = random.Random(seed)  # Fault injection sequence, reproducible for a serial client
+    rng_lock = threading.Lock()
+    stats = {'requests': 0, 'locations': 0, 'bulk_requests': 0, 'errors': 0, 'throttled': 0}
+    stats_lock = threading.Lock()
+
+    def count(**fields):
+        with stats_lock:
+            for field, amount in fields.items():
+                stats[field] += amount
+
+    def error(kind):
+        status, code, message = ERRORS[kind]
+        return jsonify({'error': {'code': code, 'message': message}}), status
+
+    def inject():
+        """Sleep for the sampled latency, then maybe fail the whole request"""
+        with rng_lock:
+            delay = latency_model.sample(rng)
+            roll = rng.random()
+        if delay:
+            time.sleep(delay)
+        if limiter is not None and not limiter.acquire(timeout=0):
+            count(throttled=1)
+            return error('throttled')
+        if roll < throttle_rate:
+            count(throttled=1)
+            return error('throttled')
+        if roll < throttle_rate + error_rate:
+            count(errors=1)
+            return error('internal')
+        return None
+
+    def serve(build):
+        count(requests=1)
+        if not request.args.get('key'):
+            return error('missing_key')
+        failure = inject()
+        if failure is not None:
+            return failure
+
+        if request.args.get('q') == 'bulk' and request.method == 'POST':
+            count(bulk_requests=1)
+            locations = (request.get_json(silent=True) or {}).get('locations', [])
+            bulk = []
+            for location in locations:
+                query = {'custom_id': location.get('custom_id'), 'q': location.get('q')}
+                coords = parse_query(location.get('q'))
+                if coords is None:
+                    _, code, message = ERRORS['bad_query']
+                    query['error'] = {'code': code, 'message': message}
+                else:
+                    query.update(build(*coords))
+                bulk.append({'query': query})
+            count(locations=len(locations))
+            return jsonify({'bulk': bulk})
+
+        coords = parse_query(request.args.get('q'))
+        if coords is None:
+            return error('bad_query')
+        count(locations=1)
+        return jsonify(build(*coords))
+
+    @mock.route('/v1/forecast.json', methods=['GET', 'POST'])
+    def forecast():
+        days = request.args.get('days', 1, type=int)
+        return serve(lambda lat, lon: generator.forecast(lat, lon, days=days))
+
+    @mock.route('/v1/current.json', methods=['GET', 'POST'])
+    def current():
+        def build(lat, lon):
+            # Cached payloads are shared, so copy rather than delete the key
+            return {key: value for key, value in generator.forecast(lat, lon, days=1).items() if key != 'forecast'}
+        return serve(build)
+
+    @mock.route('/_stats')
+    def mock_stats():
+        with stats_lock:
+            return jsonify(dict(stats, seed=seed, latency=latency_model.spec, error_rate=error_rate,
+                                throttle_rate=throttle_rate, rate_limit=rate_limit))
+
+    return mock
+
+
+def main():
+    env = lambda name, default: os.getenv(f'MOCK_WEATHERAPI_{name}', default)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=env('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(env('PORT', 5055)))
+    parser.add_argument('--seed', type=int, default=int(env('SEED', 0)))
+    parser.add_argument('--latency', default=env('LATENCY', 'none'),
+                        help="none | fixed:MS | uniform:LOW:HIGH | exponential:MEAN | lognormal:MEDIAN:SIGMA")
+    parser.add_argument('--error-rate', type=float, default=float(env('ERROR_RATE', 0)),
+                        help="Fraction of requests answered with HTTP 500")
+    parser.add_argument('--throttle-rate', type=float, default=float(env('THROTTLE_RATE', 0)),
+                        help="Fraction of requests answered with HTTP 429")
+    parser.add_argument('--rate-limit', type=float, default=float(env('RATE_LIMIT', 0)),
+                        help="Requests per second before answering 429; 0 disables")
+    parser.add_argument('--refresh', type=float, default=float(env('REFRESH', 900)),
+                        help="Seconds between changes in the generated weather")
+    args = parser.parse_args()
+
+    mock = create_app(args.seed, args.latency, args.error_rate, args.throttle_rate, args.rate_limit, args.refresh)
+    mock.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
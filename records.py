@@ -0,0 +1,105 @@
+import json
+from dataclasses import astuple, dataclass
+
+from forecast import hourly_columns
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library decoder is the fallback
+    orjson = None
+
+# Bumped whenever a record's fields change, so stale shared-cache rows read as misses
+SCHEMA_VERSION = 1
+
+
+def parse_json(body):
+    """Decode a JSON document from bytes or str, with orjson when installed"""
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+@dataclass(slots=True)
+class CityObservation:
+    """Current conditions for one location, in the units the dashboard uses"""
+
+    temp: float  # °C
+    feels_like: float  # °C
+    humidity: float  # %
+    pressure: float  # mb
+    wind_speed: float  # m/s
+    condition: str  # Provider text, e.g. "Partly cloudy"
+    icon: str
+    observed_at: int | None  # Epoch of the provider's observation
+
+    @classmethod
+    def from_weatherapi(cls, current):
+        condition = current['condition']
+        return cls(
+            current['temp_c'], current['feelslike_c'], current['humidity'], current['pressure_mb'],
+            current['wind_kph'] / 3.6, condition['text'], condition['icon'], current.get('last_updated_epoch')
+        )
+
+    @property
+    def weather_main(self):
+        """Coarse condition used for grouping, the first word of the provider text"""
+        return self.condition.split()[0]
+
+    @property
+    def description(self):
+        return self.condition.lower()
+
+
+@dataclass(slots=True)
+class ForecastPoint:
+    """One forecast day's summary"""
+
+    date_epoch: int
+    avg_temp: float  # °C
+    min_temp: float  # °C
+    max_temp: float  # °C
+    avg_humidity: float  # %
+    max_wind_speed: float  # m/s
+    condition: str
+
+    @classmethod
+    def from_weatherapi(cls, forecastday):
+        day = forecastday['day']
+        return cls(
+            forecastday['date_epoch'], day['avgtemp_c'], day['mintemp_c'], day['maxtemp_c'],
+            day['avghumidity'], day['maxwind_kph'] / 3.6, day['condition']['text']
+        )
+
+
+@dataclass(slots=True)
+class CityWeather:
+    """Everything the dashboard keeps from one forecast.json answer.
+
+    Parsed in a single pass straight from the provider payload; hourly
+    points stay as flat columns (see forecast.hourly_columns) because
+    they only ever feed the NumPy projection.
+    """
+
+    current: CityObservation
+    forecast: tuple  # ForecastPoint per day
+    hourly: dict  # {field: [value per hour]}, see hourly_columns
+
+    @classmethod
+    def from_weatherapi(cls, data):
+        forecastdays = data['forecast']['forecastday']
+        return cls(
+            CityObservation.from_weatherapi(data['current']),
+            tuple(ForecastPoint.from_weatherapi(day) for day in forecastdays),
+            hourly_columns(forecastdays)
+        )
+
+    # --- shared cache encoding: positional, so no key names are stored per city ---
+    def dumps(self):
+        return json.dumps([SCHEMA_VERSION, astuple(self.current), [astuple(day) for day in self.forecast],
+                           self.hourly], separators=(',', ':'))
+
+    @classmethod
+    def loads(cls, text):
+        """Inverse of dumps; ValueError for rows written under another schema"""
+        version, current, forecast, hourly = parse_json(text)
+        if version != SCHEMA_VERSION:
+            raise ValueError(f"weather record schema {version}, expected {SCHEMA_VERSION}")
+        return cls(CityObservation(*current), tuple(ForecastPoint(*day) for day in forecast), hourly)
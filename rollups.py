@@ -0,0 +1,176 @@
+import math
+import threading
+from heapq import heapify, heappop, heappush
+from collections import Counter
+
+LEVELS = ('global', 'continent', 'country')
+GLOBAL_KEY = 'all'
+HEAP_SLACK = 32  # Removed values allowed to linger in the heaps beyond the live count
+
+
+class RunningStats:
+    """Count, mean, variance, min and max that accept additions and removals.
+
+    Mean and variance use Welford's update and its inverse, so both are
+    O(1). Min and max come from a min-heap and a max-heap with lazy
+    deletion: a removed value is only popped once it reaches the top, so
+    add and remove are O(log n) amortised and reading min/max is O(1).
+    Removals are in arbitrary order (any city can change), which rules out
+    a sliding-window deque. When removed values make up more than half of
+    a heap plus HEAP_SLACK, both heaps are rebuilt in O(n), at most once
+    per n removals, so memory stays within twice the live count.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', '_low', '_high', '_gone_low', '_gone_high')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._low = []  # Min-heap of values
+        self._high = []  # Max-heap, as negated values
+        self._gone_low = Counter()  # Removed values still buried in _low
+        self._gone_high = Counter()  # ... and in _high, negated
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        heappush(self._low, value)
+        heappush(self._high, -value)
+
+    def remove(self, value):
+        if self.count <= 1:
+            self.__init__()
+            return
+        previous_mean = (self.count * self.mean - value) / (self.count - 1)
+        self.m2 = max(0.0, self.m2 - (value - previous_mean) * (value - self.mean))
+        self.mean = previous_mean
+        self.count -= 1
+        self._gone_low[value] += 1
+        self._gone_high[-value] += 1
+        self._prune()
+
+    def _prune(self):
+        """Pop removed values off the heap tops; rebuild once they pile up below"""
+        if len(self._low) > 2 * self.count + HEAP_SLACK:
+            live = list((Counter(self._low) - self._gone_low).elements())
+            self._low = live
+            self._high = [-value for value in live]
+            heapify(self._low)
+            heapify(self._high)
+            self._gone_low.clear()
+            self._gone_high.clear()
+            return
+        for heap, gone in ((self._low, self._gone_low), (self._high, self._gone_high)):
+            while heap and gone[heap[0]]:
+                top = heappop(heap)
+                gone[top] -= 1
+                if not gone[top]:
+                    del gone[top]
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else 0.0
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0, 'sum': 0, 'mean': 0, 'min': None, 'max': None, 'variance': 0, 'stddev': 0}
+        return {
+            'count': self.count,
+            'sum': self.mean * self.count,
+            'mean': self.mean,
+            'min': self._low[0],
+            'max': -self._high[0],
+            'variance': self.variance,
+            'stddev': math.sqrt(self.variance)
+        }
+
+
+class RollupNode:
+    """Running aggregates for one country, continent or the globe"""
+
+    __slots__ = ('temp', 'energy_index', 'humidity', 'conditions')
+
+    def __init__(self):
+        self.temp = RunningStats()
+        self.energy_index = RunningStats()
+        self.humidity = RunningStats()
+        self.conditions = Counter()
+
+    def add(self, observation):
+        self.temp.add(observation['temp'])
+        self.energy_index.add(observation['energy_index'])
+        self.humidity.add(observation['humidity'])
+        self.conditions[observation['condition']] += 1
+
+    def remove(self, observation):
+        self.temp.remove(observation['temp'])
+        self.energy_index.remove(observation['energy_index'])
+        self.humidity.remove(observation['humidity'])
+        self.conditions[observation['condition']] -= 1
+        if self.conditions[observation['condition']] <= 0:
+            del self.conditions[observation['condition']]
+
+    def summary(self):
+        return {
+            'count': self.temp.count,
+            'temp': self.temp.summary(),
+            'energy_index': self.energy_index.summary(),
+            'humidity': self.humidity.summary(),
+            'conditions': dict(self.conditions)
+        }
+
+
+class RollupTree:
+    """City -> country -> continent -> global aggregates, maintained incrementally.
+
+    `update` swaps one city's previous observation for its new one in the
+    three nodes above it, so each city change costs the same no matter
+    how many cities are tracked, and readers never rescan cities.
+    """
+
+    def __init__(self):
+        self._cities = {}
+        self._nodes = {level: {} for level in LEVELS}
+        self._lock = threading.Lock()
+
+    def _path(self, country, continent):
+        for level, key in (('global', GLOBAL_KEY), ('continent', continent), ('country', country)):
+            nodes = self._nodes[level]
+            if key not in nodes:
+                nodes[key] = RollupNode()
+            yield nodes[key]
+
+    def update(self, city_key, country, continent, temp, energy_index, humidity, condition):
+        """Record a city's latest observation, replacing any earlier one"""
+        observation = {'temp': temp, 'energy_index': energy_index, 'humidity': humidity, 'condition': condition}
+        with self._lock:
+            self._discard(city_key)
+            self._cities[city_key] = (country, continent, observation)
+            for node in self._path(country, continent):
+                node.add(observation)
+
+    def discard(self, city_key):
+        """Drop a city from every aggregate, e.g. when its fetch failed"""
+        with self._lock:
+            self._discard(city_key)
+
+    def _discard(self, city_key):
+        previous = self._cities.pop(city_key, None)
+        if previous is not None:
+            country, continent, observation = previous
+            for node in self._path(country, continent):
+                node.remove(observation)
+
+    def summary(self, level, key=GLOBAL_KEY):
+        """Aggregates for one node, or None if nothing was recorded under it"""
+        with self._lock:
+            node = self._nodes[level].get(key)
+            return node.summary() if node is not None and node.temp.count else None
+
+    def level(self, level):
+        """{key: aggregates} for every populated node at a level"""
+        with self._lock:
+            return {key: node.summary() for key, node in self._nodes[level].items() if node.temp.count}
@@ -0,0 +1,113 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalescing then stays within each process
+    fcntl = None
+
+DEFAULT_DIR = os.path.join(tempfile.gettempdir(), 'enerwe-singleflight')
+DEFAULT_WAIT = 10.0
+LOCK_POLL_INTERVAL = 0.02
+
+
+class _Call:
+    __slots__ = ('done', 'value')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class SingleFlight:
+    """Collapse concurrent computations of the same key into one.
+
+    Within a process, the first caller for a key runs `compute` and every
+    caller that arrives while it runs waits for and shares its result.
+    Across gunicorn workers the leader also holds an flock on a per-key
+    file under `directory`. Once it has the lock it calls `recheck`
+    first, so a worker that had to wait picks up what the previous holder
+    stored in a shared cache and only computes on a miss. Waiting is capped at `wait` seconds, after which the caller computes
+    on its own rather than fail.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, wait=DEFAULT_WAIT, on_event=None):
+        self.directory = directory if fcntl is not None else None
+        self.wait = wait
+        self.on_event = on_event or (lambda key, event: None)
+        self._calls = {}
+        self._lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, cross_process=True, on_event=None):
+        """Configured from SINGLEFLIGHT_DIR (empty keeps it per process) / SINGLEFLIGHT_WAIT"""
+        return cls(
+            directory=(os.getenv('SINGLEFLIGHT_DIR', DEFAULT_DIR) or None) if cross_process else None,
+            wait=float(os.getenv('SINGLEFLIGHT_WAIT', DEFAULT_WAIT)),
+            on_event=on_event
+        )
+
+    def do(self, key, compute, recheck=None):
+        """Result of compute() for key, shared with concurrent callers; events go to on_event"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self.on_event(key, 'follower')
+            if call.done.wait(self.wait):
+                return call.value
+            self.on_event(key, 'wait_timeout')
+            return compute()
+
+        try:
+            with self._process_lock(key):
+                # Another leader may have finished between the caller's own lookup and now
+                value = recheck() if recheck is not None else None
+                if value is None:
+                    self.on_event(key, 'leader')
+                    value = compute()
+                else:
+                    self.on_event(key, 'shared')
+            call.value = value
+            return value
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    @contextmanager
+    def _process_lock(self, key):
+        """Exclusive flock for key across processes, given up after `wait` seconds"""
+        if not self.directory:
+            yield
+            return
+        path = os.path.join(self.directory, hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest() + '.lock')
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            print(f"Single-flight lock unavailable for {key}: {e}")
+            yield
+            return
+        try:
+            give_up_at = time.monotonic() + self.wait
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= give_up_at:
+                        self.on_event(key, 'lock_timeout')
+                        break  # Go ahead unlocked: a duplicate fetch beats a failed one
+                    time.sleep(LOCK_POLL_INTERVAL)
+            yield
+        finally:
+            os.close(fd)  # Also releases the flock
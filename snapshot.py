@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import tempfile
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+DEFAULT_INTERVAL = 600  # Seconds between background rebuilds
+DEFAULT_FIRST_BUILD_WAIT = 15
+DEFAULT_HISTORY = 12     # Past snapshots kept for delta updates
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'enerwe-snapshot.json.z')
+STORE_FORMAT = 1         # Bumped when the file layout changes; other versions are ignored
+
+
+def snapshot_digest(continents):
+    """Content version of a continent overview.
+
+    A hash rather than a counter, so every gunicorn worker that crawled the
+    same (shared-cache) data agrees on the version a client holds.
+    """
+    body = json.dumps(continents, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def diff_continents(old, new):
+    """Changes turning the `old` continent overview into `new`.
+
+    Per continent: changed aggregate fields, names of aggregate fields that
+    are gone, added or changed cities (matched by name), names of removed
+    cities and, when it differs, the full failed_cities list. Continents
+    without changes are left out.
+    """
+    changes = {}
+    for continent, current in new.items():
+        previous = old.get(continent, {})
+        change = {}
+
+        aggregates = {
+            key: value for key, value in current.items()
+            if key not in ('cities', 'failed_cities') and previous.get(key) != value
+        }
+        if aggregates:
+            change['aggregates'] = aggregates
+        removed_aggregates = [
+            key for key in previous
+            if key not in ('cities', 'failed_cities') and key not in current
+        ]
+        if removed_aggregates:
+            change['removed_aggregates'] = removed_aggregates
+
+        previous_cities = {city['name']: city for city in previous.get('cities', [])}
+        current_names = set()
+        cities = []
+        for city in current.get('cities', []):
+            current_names.add(city['name'])
+            if previous_cities.get(city['name']) != city:
+                cities.append(city)
+        if cities:
+            change['cities'] = cities
+
+        removed = [name for name in previous_cities if name not in current_names]
+        if removed:
+            change['removed'] = removed
+
+        if current.get('failed_cities', []) != previous.get('failed_cities', []):
+            change['failed_cities'] = current.get('failed_cities', [])
+
+        if change:
+            changes[continent] = change
+    return changes
+
+
+class Snapshot:
+    """Immutable result of one full crawl, swapped in as a whole"""
+
+    __slots__ = ('version', 'digest', 'generated_at', 'continents', 'details', 'forecast', 'carried', 'restored')
+
+    def __init__(self, version, generated_at, continents, details, forecast=None, carried=(), restored=False):
+        self.version = version
+        self.digest = snapshot_digest(continents)
+        self.generated_at = generated_at
+        self.continents = continents
+        self.details = details
+        self.forecast = forecast
+        # Cities whose fetch failed this crawl, shown with their last-known data
+        self.carried = tuple(carried)
+        # Loaded from a previous process's file rather than crawled by this one
+        self.restored = restored
+
+    def age(self, now=None):
+        return (now or time.time()) - self.generated_at
+
+    def headers(self, stale_after):
+        """Freshness headers for responses served from this snapshot.
+
+        They travel as headers rather than body fields so the body, and
+        with it the ETag, only changes when the data itself does.
+        """
+        age = self.age()
+        return {
+            'X-Snapshot-Version': self.digest,
+            'X-Snapshot-Generated-At': datetime.fromtimestamp(self.generated_at, timezone.utc).isoformat(),
+            'X-Snapshot-Age': f"{age:.1f}",
+            'X-Snapshot-Stale': 'true' if self.restored or self.carried or age > stale_after else 'false',
+            'X-Snapshot-Carried-Forward': str(len(self.carried))
+        }
+
+
+def reporting_cities(continents):
+    return sum(len(overview.get('cities', ())) for overview in continents.values())
+
+
+class SnapshotStore:
+    """The latest snapshot on disk, so a restarted worker can serve before its first crawl.
+
+    Stored as zlib-compressed JSON and written to a temp file that is
+    renamed over the old one, so a reader (another worker, the next boot)
+    sees either the previous file or the new one, never a partial write.
+    `encode_forecast`/`decode_forecast` convert the forecast projection.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, encode_forecast=None, decode_forecast=None):
+        self.path = path
+        self.encode_forecast = encode_forecast
+        self.decode_forecast = decode_forecast
+
+    @classmethod
+    def from_env(cls, **codec):
+        """Store at SNAPSHOT_PATH, or None when it is set empty"""
+        path = os.getenv('SNAPSHOT_PATH', DEFAULT_PATH)
+        return cls(path, **codec) if path else None
+
+    def save(self, snapshot):
+        """Write the snapshot, unless it has no city data to restore"""
+        if not reporting_cities(snapshot.continents):
+            print("Not saving a snapshot without any reporting city")
+            return
+        forecast = snapshot.forecast
+        state = {
+            'format': STORE_FORMAT,
+            'generated_at': snapshot.generated_at,
+            'continents': snapshot.continents,
+            'details': snapshot.details,
+            'forecast': self.encode_forecast(forecast) if forecast is not None and self.encode_forecast else None,
+            'carried': list(snapshot.carried)
+        }
+        body = zlib.compress(json.dumps(state, separators=(',', ':')).encode('utf-8'), 6)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Snapshot save failed: {e}")
+
+    def load(self, version=0):
+        """The stored snapshot marked as restored, or None if there is no usable file"""
+        try:
+            with open(self.path, 'rb') as f:
+                state = json.loads(zlib.decompress(f.read()))
+            if state.get('format') != STORE_FORMAT or not reporting_cities(state['continents']):
+                return None
+            forecast = state['forecast']
+            if forecast is not None and self.decode_forecast:
+                forecast = self.decode_forecast(forecast)
+            return Snapshot(version, state['generated_at'], state['continents'], state['details'], forecast,
+                            state.get('carried', ()), restored=True)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError, zlib.error) as e:
+            print(f"Ignoring unreadable snapshot file {self.path}: {e}")
+            return None
+
+
+class SnapshotRefresher:
+    """Rebuilds the continent snapshot on a fixed interval in a daemon thread.
+
+    Request handlers only ever read `current()`, so serving never waits on
+    the upstream API once the first snapshot exists. If a snapshot has
+    outlived `stale_after` (e.g. a rebuild failed) it is still served, marked
+    stale, while a rebuild is kicked off: stale-while-revalidate.
+    The thread is started lazily per process so it survives gunicorn forks.
+    With a `store`, each new snapshot is also written to disk and a fresh
+    process starts out serving the stored one, marked stale.
+    """
+
+    def __init__(self, build, interval=DEFAULT_INTERVAL, stale_after=None,
+                 first_build_wait=DEFAULT_FIRST_BUILD_WAIT, history=DEFAULT_HISTORY, store=None):
+        self._build = build
+        self.store = store
+        self.interval = interval
+        self.stale_after = stale_after if stale_after is not None else interval * 1.5
+        self.first_build_wait = first_build_wait
+        self._snapshot = None
+        self._history = deque(maxlen=history)
+        self._version = 0
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+
+    @classmethod
+    def from_env(cls, build, store=None):
+        """Build a refresher configured from SNAPSHOT_* environment variables"""
+        interval = float(os.getenv('SNAPSHOT_INTERVAL', DEFAULT_INTERVAL))
+        stale_after = os.getenv('SNAPSHOT_STALE_AFTER')
+        return cls(
+            build,
+            interval=interval,
+            stale_after=float(stale_after) if stale_after else None,
+            first_build_wait=float(os.getenv('SNAPSHOT_FIRST_BUILD_WAIT', DEFAULT_FIRST_BUILD_WAIT)),
+            history=int(os.getenv('SNAPSHOT_HISTORY', DEFAULT_HISTORY)),
+            store=store
+        )
+
+    def start(self):
+        """Start the background thread once per process, serving the stored snapshot until it has built one"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            if self._snapshot is None and self.store is not None:
+                restored = self.store.load(self._version)
+                if restored is not None:
+                    self._history.append(restored)
+                    self._snapshot = restored
+                    self._ready.set()
+            thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+            thread.start()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def refresh(self):
+        """Build a new snapshot and swap it in; a failed build (None or an exception) keeps the old one"""
+        if not self._build_lock.acquire(blocking=False):
+            return  # A rebuild is already running
+        try:
+            result = self._build()
+            if result is None:
+                return
+            self._version += 1
+            # Rebinding one attribute is atomic, readers see old or new, never a mix
+            snapshot = Snapshot(self._version, time.time(), *result)
+            if not self._history or self._history[-1].digest != snapshot.digest:
+                self._history.append(snapshot)
+            self._snapshot = snapshot
+            self._ready.set()
+            # Only builds that passed app.build_snapshot_data's success check get here
+            if self.store is not None:
+                self.store.save(snapshot)
+        except Exception as e:
+            print(f"Snapshot refresh failed: {e}")
+        finally:
+            self._build_lock.release()
+
+    @property
+    def ready(self):
+        """Whether a first snapshot exists, without waiting for it"""
+        return self._ready.is_set()
+
+    def request_refresh(self):
+        """Wake the background thread for an early rebuild"""
+        self._wake.set()
+
+    def current(self, wait=True):
+        """Latest snapshot, waiting for the very first build if necessary (and `wait`)"""
+        self.start()
+        snapshot = self._snapshot
+        if snapshot is None:
+            if wait:
+                self._ready.wait(self.first_build_wait)
+            return self._snapshot
+        if snapshot.age() > self.stale_after:
+            self.request_refresh()
+        return snapshot
+
+    def find(self, digest):
+        """A recent snapshot by content version, or None once it has aged out"""
+        # Copy first; the refresher thread may append while we scan
+        for snapshot in reversed(list(self._history)):
+            if snapshot.digest == digest:
+                return snapshot
+        return None
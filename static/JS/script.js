@@ -466,37 +466,257 @@ document.addEventListener('DOMContentLoaded', () => {
         `;
     }
 
+    // --- COMPACT PAYLOADS ---
+    const MSGPACK_TYPE = 'application/x-msgpack';
+    const COLUMNAR_TYPE = 'application/vnd.enerwe.columnar+json';
+
+    // Minimal MessagePack decoder for the types the API emits (no ext types)
+    function decodeMsgpack(buffer) {
+        const view = new DataView(buffer);
+        const bytes = new Uint8Array(buffer);
+        const textDecoder = new TextDecoder();
+        let offset = 0;
+
+        const uint = (size) => {
+            const value = size === 1 ? view.getUint8(offset)
+                : size === 2 ? view.getUint16(offset)
+                : size === 4 ? view.getUint32(offset)
+                : Number(view.getBigUint64(offset));
+            offset += size;
+            return value;
+        };
+        const int = (size) => {
+            const value = size === 1 ? view.getInt8(offset)
+                : size === 2 ? view.getInt16(offset)
+                : size === 4 ? view.getInt32(offset)
+                : Number(view.getBigInt64(offset));
+            offset += size;
+            return value;
+        };
+        const str = (length) => {
+            const value = textDecoder.decode(bytes.subarray(offset, offset + length));
+            offset += length;
+            return value;
+        };
+        const array = (length) => {
+            const value = new Array(length);
+            for (let i = 0; i < length; i++) value[i] = read();
+            return value;
+        };
+        const map = (length) => {
+            const value = {};
+            for (let i = 0; i < length; i++) {
+                const key = read();
+                value[key] = read();
+            }
+            return value;
+        };
+
+        function read() {
+            const type = bytes[offset++];
+            if (type <= 0x7f) return type;
+            if (type >= 0xe0) return type - 0x100;
+            if ((type & 0xe0) === 0xa0) return str(type & 0x1f);
+            if ((type & 0xf0) === 0x90) return array(type & 0x0f);
+            if ((type & 0xf0) === 0x80) return map(type & 0x0f);
+            switch (type) {
+                case 0xc0: return null;
+                case 0xc2: return false;
+                case 0xc3: return true;
+                case 0xc4: { const length = uint(1); offset += length; return bytes.slice(offset - length, offset); }
+                case 0xc5: { const length = uint(2); offset += length; return bytes.slice(offset - length, offset); }
+                case 0xc6: { const length = uint(4); offset += length; return bytes.slice(offset - length, offset); }
+                case 0xca: { const value = view.getFloat32(offset); offset += 4; return value; }
+                case 0xcb: { const value = view.getFloat64(offset); offset += 8; return value; }
+                case 0xcc: return uint(1);
+                case 0xcd: return uint(2);
+                case 0xce: return uint(4);
+                case 0xcf: return uint(8);
+                case 0xd0: return int(1);
+                case 0xd1: return int(2);
+                case 0xd2: return int(4);
+                case 0xd3: return int(8);
+                case 0xd9: return str(uint(1));
+                case 0xda: return str(uint(2));
+                case 0xdb: return str(uint(4));
+                case 0xdc: return array(uint(2));
+                case 0xdd: return array(uint(4));
+                case 0xde: return map(uint(2));
+                case 0xdf: return map(uint(4));
+                default: throw new Error(`Unsupported MessagePack type 0x${type.toString(16)}`);
+            }
+        }
+
+        return read();
+    }
+
+    // Turn the columnar layout (see compact.py) back into lists of records
+    function decodeColumnar(value) {
+        if (Array.isArray(value)) {
+            return value.map(decodeColumnar);
+        }
+        if (!value || typeof value !== 'object') {
+            return value;
+        }
+        if (value._columns) {
+            const records = Array.from({ length: value._length }, () => ({}));
+            Object.entries(value._columns).forEach(([field, column]) => {
+                const path = field.split('.');
+                const last = path.pop();
+                records.forEach((record, i) => {
+                    let target = record;
+                    path.forEach(key => { target = target[key] = target[key] || {}; });
+                    target[last] = column[i];
+                });
+            });
+            return records;
+        }
+        const decoded = {};
+        Object.entries(value).forEach(([key, item]) => { decoded[key] = decodeColumnar(item); });
+        return decoded;
+    }
+
+    // Ask for the compact encoding; the server answers plain JSON if it can't provide it
+    async function fetchCompact(url) {
+        const canDecode = typeof TextDecoder !== 'undefined' && typeof DataView.prototype.getBigUint64 === 'function';
+        const response = await fetch(url, {
+            headers: { Accept: canDecode ? `${MSGPACK_TYPE}, application/json;q=0.5` : 'application/json' }
+        });
+        const contentType = response.headers.get('Content-Type') || '';
+        if (contentType.startsWith(MSGPACK_TYPE)) {
+            return decodeColumnar(decodeMsgpack(await response.arrayBuffer()));
+        }
+        const body = await response.json();
+        return contentType.startsWith(COLUMNAR_TYPE) ? decodeColumnar(body) : body;
+    }
+
     // --- DATA FETCHING ---
+    // Apply one NDJSON record from the streaming endpoint
+    function applyStreamRecord(record) {
+        if (record.type === 'done') {
+            if (lastUpdateElement && record.generated_at) {
+                lastUpdateElement.textContent = new Date(record.generated_at).toLocaleString();
+            }
+            return;
+        }
+
+        if (!weatherEnergyData[record.continent]) {
+            weatherEnergyData[record.continent] = {
+                cities: [],
+                failed_cities: [],
+                avg_temp: 0,
+                avg_energy_index: 0,
+                weather_summary: {}
+            };
+        }
+        const entry = weatherEnergyData[record.continent];
+
+        if (record.type === 'city') {
+            entry.cities.push(record.city);
+            // First data is in, the map can take over from the spinner
+            if (loadingIndicator) {
+                loadingIndicator.style.display = 'none';
+            }
+        } else if (record.type === 'failed') {
+            entry.failed_cities.push(record.city);
+        } else if (record.type === 'continent') {
+            Object.assign(entry, record.summary);
+            if (geojsonLayer) {
+                geojsonLayer.setStyle(getFeatureStyle);
+            }
+        }
+    }
+
+    // Read city records as they are fetched instead of waiting for all of them
+    async function streamWeatherData() {
+        const response = await fetch('/api/weather-energy-by-continent/stream');
+        if (!response.ok) {
+            const body = await response.json().catch(() => ({}));
+            if (body.error) {
+                showApiKeyError(body.error);
+                return false;
+            }
+            throw new Error(`Weather API error: ${response.statusText}`);
+        }
+
+        weatherEnergyData = {};
+        const applyLines = (lines) => lines.filter(Boolean).forEach(line => applyStreamRecord(JSON.parse(line)));
+
+        if (!response.body || typeof TextDecoder === 'undefined') {
+            // No streaming support in this browser: same records, all at once
+            applyLines((await response.text()).split('\n'));
+            return true;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split('\n');
+            buffered = lines.pop();
+            applyLines(lines);
+        }
+        applyLines([buffered + decoder.decode()]);
+        return true;
+    }
+
+    // Snapshot the server inlined into the page, or null to load everything over the API
+    function readInitialData() {
+        const element = document.getElementById('initial-data');
+        if (!element) {
+            return null;
+        }
+        try {
+            return JSON.parse(element.textContent);
+        } catch (error) {
+            console.error('Ignoring unreadable initial data:', error);
+            return null;
+        }
+    }
+
     async function loadAllData() {
+        const initialData = readInitialData();
+        if (initialData) {
+            // First paint straight from the page, no API round-trips
+            weatherEnergyData = initialData.continents;
+            globalInsights = initialData.summary;
+            snapshotVersion = initialData.version;
+            initializeMap(initialData.geojson);
+            loadGlobalInsights();
+            if (lastUpdateElement) {
+                lastUpdateElement.textContent = new Date(initialData.generated_at).toLocaleString();
+            }
+            if (initialData.restored) {
+                // Saved by a previous server process; pick up its first fresh crawl early
+                setTimeout(refreshData, 20000);
+            }
+            return;
+        }
+
         try {
             if (loadingIndicator) {
                 loadingIndicator.style.display = 'flex';
             }
             
-            // Fetch weather and energy data
-            const weatherResponse = await fetch('/api/weather-energy-by-continent');
-            if (!weatherResponse.ok) {
-                throw new Error(`Weather API error: ${weatherResponse.statusText}`);
-            }
-            weatherEnergyData = await weatherResponse.json();
+            // Load continent boundaries first so each continent is coloured as its data arrives
+            // (from the fingerprinted build when there is one, see assets.py)
+            const geojsonResponse = await fetch(document.body.dataset.geojsonUrl || '/static/continents.geo.json');
+            const geojsonData = await geojsonResponse.json();
+            weatherEnergyData = {};
+            initializeMap(geojsonData);
             
-            // Check for API key error
-            if (weatherEnergyData.error) {
-                showApiKeyError(weatherEnergyData.error);
+            // Stream weather and energy data
+            if (!(await streamWeatherData())) {
                 return;
             }
             
-            // Fetch global insights
-            const insightsResponse = await fetch('/api/global-energy-summary');
+            // Fetch global insights (revalidated against the browser cache via ETag)
+            const insightsResponse = await fetch('/api/global-energy-summary', { cache: 'no-cache' });
             globalInsights = await insightsResponse.json();
             
-            // Load continent boundaries
-            const geojsonResponse = await fetch('/static/continents.geo.json');
-            const geojsonData = await geojsonResponse.json();
-            
-            // Initialize map with weather data
-            initializeMap(geojsonData);
-            
             // Load global insights
             loadGlobalInsights();
             
@@ -561,12 +781,54 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function initializeMap(geojsonData) {
+        // Auto-refresh re-initializes; drop the previous layer instead of stacking another
+        if (geojsonLayer) {
+            map.removeLayer(geojsonLayer);
+        }
         geojsonLayer = L.geoJson(geojsonData, {
             style: (feature) => getFeatureStyle(feature),
             onEachFeature: onEachFeature
         }).addTo(map);
     }
 
+    // --- VIEWPORT SITES ---
+    const siteLayer = L.layerGroup().addTo(map);
+    const SITE_MIN_ZOOM = 4;
+    let siteRequestId = 0;
+
+    async function loadViewportSites() {
+        const requestId = ++siteRequestId;
+        if (map.getZoom() < SITE_MIN_ZOOM) {
+            siteLayer.clearLayers();
+            return;
+        }
+
+        const bounds = map.getBounds();
+        const params = new URLSearchParams({
+            south: bounds.getSouth(),
+            west: bounds.getWest(),
+            north: bounds.getNorth(),
+            east: bounds.getEast()
+        });
+
+        try {
+            const response = await fetch(`/api/sites/bbox?${params}`);
+            const data = await response.json();
+            if (requestId !== siteRequestId) return; // A newer pan/zoom already answered
+
+            siteLayer.clearLayers();
+            (data.sites || []).forEach(site => {
+                L.circleMarker([site.lat, site.lon], { radius: 4, color: '#ffffff', weight: 1, fillOpacity: 0.8 })
+                    .bindTooltip(`${site.name} (${site.country})`)
+                    .addTo(siteLayer);
+            });
+        } catch (error) {
+            console.error('Error loading viewport sites:', error);
+        }
+    }
+
+    map.on('moveend', loadViewportSites);
+
     // --- MAP INTERACTIVITY ---
     const highlightStyle = { weight: 4, color: '#ffc107', fillOpacity: 0.9 };
 
@@ -791,8 +1053,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
         try {
             // Fetch detailed data for this continent
-            const detailResponse = await fetch(`/api/continent-details/${continent}`);
-            const detailData = await detailResponse.json();
+            const detailData = await fetchCompact(`/api/continent-details/${continent}`);
             
             displayDetailedResults(continentName, data, detailData);
         } catch (error) {
@@ -962,10 +1223,80 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- AUTO-REFRESH FUNCTIONALITY ---
+    let snapshotVersion = null;
+
+    // Patch changed cities and aggregates into weatherEnergyData in place
+    function applyDelta(changes) {
+        for (const [continent, change] of Object.entries(changes)) {
+            if (!weatherEnergyData[continent]) {
+                weatherEnergyData[continent] = { cities: [], failed_cities: [] };
+            }
+            const entry = weatherEnergyData[continent];
+
+            Object.assign(entry, change.aggregates || {});
+            (change.removed_aggregates || []).forEach(key => {
+                delete entry[key];
+            });
+            if (change.failed_cities) {
+                entry.failed_cities = change.failed_cities;
+            }
+
+            const removed = new Set(change.removed || []);
+            if (removed.size) {
+                entry.cities = entry.cities.filter(city => !removed.has(city.name));
+            }
+            (change.cities || []).forEach(city => {
+                const index = entry.cities.findIndex(existing => existing.name === city.name);
+                if (index >= 0) {
+                    entry.cities[index] = city;
+                } else {
+                    entry.cities.push(city);
+                }
+            });
+        }
+    }
+
+    // Ask only for what changed since the snapshot version we last applied
+    async function refreshData() {
+        try {
+            const query = snapshotVersion ? `?since=${encodeURIComponent(snapshotVersion)}` : '';
+            const response = await fetch(`/api/weather-energy-by-continent/delta${query}`, { cache: 'no-cache' });
+            if (!response.ok) {
+                throw new Error(`Weather API error: ${response.statusText}`);
+            }
+            const delta = await response.json();
+
+            const generatedAt = response.headers.get('X-Snapshot-Generated-At');
+            if (generatedAt && lastUpdateElement) {
+                lastUpdateElement.textContent = new Date(generatedAt).toLocaleString();
+            }
+
+            if (delta.full) {
+                weatherEnergyData = delta.continents;
+            } else if (Object.keys(delta.continents).length) {
+                applyDelta(delta.continents);
+            } else {
+                snapshotVersion = delta.version;
+                return; // Nothing changed
+            }
+            snapshotVersion = delta.version;
+
+            if (geojsonLayer) {
+                geojsonLayer.setStyle(getFeatureStyle);
+            }
+
+            const insightsResponse = await fetch('/api/global-energy-summary', { cache: 'no-cache' });
+            globalInsights = await insightsResponse.json();
+            loadGlobalInsights();
+        } catch (error) {
+            console.error('Error refreshing data:', error);
+        }
+    }
+
     function startAutoRefresh() {
         setInterval(() => {
             console.log('🔄 Auto-refreshing weather data...');
-            loadAllData();
+            refreshData();
         }, 600000); // 10 minutes
     }
 
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import pytest
+
+import asgi
+import app as dashboard
+from http_client import AsyncPooledHTTPClient, PooledHTTPClient
+from key_pool import KeyPool
+
+API_KEY = 'a1b2c3d4e5f60001'
+
+
+async def hang(request):
+    await asyncio.sleep(60)
+
+
+def async_client(handler, **kwargs):
+    client = AsyncPooledHTTPClient(PooledHTTPClient(**kwargs), pool_size=4)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def half_open_breaker(client, url):
+    breaker = client.sync_client.breaker(httpx.URL(url).host)
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+    assert breaker.state == 'half-open'
+    return breaker
+
+
+def test_cancelled_trial_does_not_wedge_the_breaker():
+    url = 'http://upstream.test/v1/forecast.json'
+
+    async def scenario():
+        client = async_client(hang, breaker_threshold=2, breaker_reset=10)
+        breaker = half_open_breaker(client, url)
+        trial = asyncio.ensure_future(client.get(url))
+        await asyncio.sleep(0.01)
+        assert not breaker.allow()
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        # The next call becomes the trial, and its answer closes the circuit
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+        assert (await client.get(url)).status_code == 200
+        assert breaker.state == 'closed'
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_chunk_cut_off_at_the_deadline_refunds_its_key(monkeypatch):
+    pool = KeyPool([(API_KEY, 100)], path=None)
+    monkeypatch.setattr(dashboard, 'key_pool', pool)
+
+    async def scenario():
+        client = async_client(hang, breaker_threshold=2, breaker_reset=10)
+        breaker = half_open_breaker(client, dashboard.forecast_url('bulk', API_KEY))
+        fetcher = asgi.AsyncWeatherFetcher(client)
+        locations = [(48.85, 2.35), (51.51, -0.13), (40.71, -74.01)]
+        results = await fetcher.gather([locations], fetcher.fetch_chunk, deadline=0.05)
+        assert results == [(locations, None, 'timeout')]
+        await asyncio.sleep(0.1)  # Let the cancelled task clean up
+        assert not breaker._trial_in_flight
+        await client.aclose()
+
+    asyncio.run(scenario())
+    assert pool.stats()['keys'][0]['calls'] == 0
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from history_store import HistoryStore, site_key
+
+HOUR = 3600
+DAY = 86400
+NOW = 20000 * DAY  # Midnight UTC, so bucket edges are easy to reason about
+
+
+def observations(start, end, step=1800):
+    for ts in range(start, end, step):
+        yield {
+            'name': 'São Paulo', 'country': 'BR', 'continent': 'south_america', 'ts': float(ts),
+            'temp': (ts // HOUR) % 24, 'humidity': 60.0, 'wind_speed': 3.0,
+            'heating_demand': 0.0, 'cooling_demand': 1.0, 'total_energy_index': 5.0
+        }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path), raw_retention=DAY, hourly_retention=3 * DAY, daily_retention=10 * DAY)
+    store._last_compacted = float('inf')  # Only compact when the test says so
+    return store
+
+
+def test_compaction_moves_whole_buckets_down_the_tiers(store):
+    store.record(observations(NOW - 12 * DAY, NOW))
+    store.compact(NOW)
+    key = site_key('São Paulo', 'BR')
+    raw, hourly, daily = (np.array(store._read(tier, key)) for tier in ('raw', 'hourly', 'daily'))
+
+    assert raw['ts'].min() == NOW - DAY
+    assert (raw['count'] == 1).all()
+
+    assert hourly['ts'].min() == NOW - 3 * DAY and hourly['ts'].max() == NOW - DAY - HOUR
+    assert (hourly['count'] == 2).all()
+    assert (hourly['ts'] % HOUR == 0).all()
+
+    # Days older than the daily retention are dropped
+    assert daily['ts'].min() == NOW - 10 * DAY and daily['ts'].max() == NOW - 4 * DAY
+    assert (daily['count'] == 48).all()
+    assert daily['temp'] == pytest.approx(11.5)
+    assert daily['temp_min'].min() == 0 and daily['temp_max'].max() == 23
+
+
+def test_compaction_keeps_every_retained_observation(store):
+    store.record(observations(NOW - 12 * DAY, NOW))
+    store.compact(NOW)
+    rows = store.series(site_key('São Paulo', 'BR'), NOW - 10 * DAY, NOW)
+
+    assert int(rows['count'].sum()) == len(list(observations(NOW - 10 * DAY, NOW)))
+    assert (np.diff(rows['ts']) > 0).all()
+
+
+def test_compacting_again_changes_nothing(store):
+    store.record(observations(NOW - 5 * DAY, NOW))
+    store.compact(NOW)
+    key = site_key('São Paulo', 'BR')
+    before = [np.array(store._read(tier, key)) for tier in ('raw', 'hourly', 'daily')]
+    store.compact(NOW)
+    after = [np.array(store._read(tier, key)) for tier in ('raw', 'hourly', 'daily')]
+    for old, new in zip(before, after):
+        assert np.array_equal(old, new)
+
+
+def test_partial_buckets_stay_in_the_finer_tier(store):
+    store.record(observations(NOW - DAY - HOUR // 2, NOW, step=600))
+    store.compact(NOW - HOUR // 4)
+    key = site_key('São Paulo', 'BR')
+    # The cutoff falls inside an hour, so that hour stays raw
+    assert len(store._read('hourly', key)) == 0
+    assert np.array(store._read('raw', key))['ts'].min() == NOW - DAY - HOUR // 2
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import pytest
+
+import http_client
+from http_client import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(http_client, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def tripped(clock, threshold=3, reset_timeout=10):
+    breaker = CircuitBreaker(threshold=threshold, reset_timeout=reset_timeout)
+    for _ in range(threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_threshold_consecutive_failures(clock):
+    breaker = CircuitBreaker(threshold=3, reset_timeout=10)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+
+def test_half_open_lets_a_single_trial_through(clock):
+    breaker = tripped(clock)
+    clock.now += 9.9
+    assert not breaker.allow()
+    clock.now += 0.1
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_successful_trial_closes_the_circuit(clock):
+    breaker = tripped(clock)
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.failures == 0
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_trial_reopens_for_a_full_timeout(clock):
+    breaker = tripped(clock)
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock.now += 9
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_one_failure_after_reset_reopens_from_half_open(clock):
+    # The trial counts on its own; the threshold doesn't start over
+    breaker = tripped(clock, threshold=5)
+    clock.now += 10
+    breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
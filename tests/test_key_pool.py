@@ -0,0 +1,116 @@
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import key_pool
+from key_pool import KeyPool
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=datetime(2024, 1, 31, 23, 59, tzinfo=timezone.utc).timestamp())
+    monkeypatch.setattr(key_pool, 'time', SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def pool(keys, **kwargs):
+    kwargs.setdefault('path', None)
+    return KeyPool(keys, **kwargs)
+
+
+def test_rotation_spreads_calls_by_budget_share(clock):
+    keys = pool([('key-a', 100), ('key-b', 300)])
+    used = Counter(keys.acquire() for _ in range(200))
+    assert used == {'key-a': 50, 'key-b': 150}
+
+
+def test_exhausted_pool_returns_none(clock):
+    keys = pool([('key-a', 2), ('key-b', 1)])
+    assert sorted(keys.acquire() for _ in range(3)) == ['key-a', 'key-a', 'key-b']
+    assert keys.acquire() is None
+    assert keys.acquire(cost=0) is not None
+
+
+def test_cost_must_fit_in_what_is_left(clock):
+    keys = pool([('key-a', 10)])
+    assert keys.acquire(cost=8) == 'key-a'
+    assert keys.acquire(cost=3) is None
+    assert keys.acquire(cost=2) == 'key-a'
+
+
+def test_budget_rolls_over_with_the_month(clock):
+    keys = pool([('key-a', 2)])
+    assert keys.acquire() and keys.acquire()
+    assert keys.acquire() is None
+    assert keys.stats()['current_period'] == '2024-01'
+
+    clock.now += 120
+    assert keys.acquire() == 'key-a'
+    stats = keys.stats()
+    assert stats['current_period'] == '2024-02'
+    assert stats['keys'][0]['calls'] == 1
+
+
+def test_daily_period_rolls_at_midnight_utc(clock):
+    keys = pool([('key-a', 1)], period='day')
+    assert keys.acquire() == 'key-a'
+    assert keys.acquire() is None
+    clock.now += 60
+    assert keys.acquire() == 'key-a'
+
+
+def test_rate_limited_key_sits_out_its_cooldown(clock):
+    keys = pool([('key-a', 100), ('key-b', 100)], cooldown=60)
+    keys.report('key-a', 429)
+    assert {keys.acquire() for _ in range(5)} == {'key-b'}
+    clock.now += 61
+    assert 'key-a' in {keys.acquire() for _ in range(5)}
+
+
+def test_rate_limited_key_still_beats_no_key(clock):
+    keys = pool([('key-a', 100), ('key-b', 100)])
+    keys.report('key-a', 429)
+    keys.report('key-b', 401)
+    assert keys.acquire() == 'key-a'
+
+
+def test_refused_key_is_out_until_the_period_ends(clock):
+    keys = pool([('key-a', 100), ('key-b', 100)])
+    keys.report('key-a', 403)
+    assert {keys.acquire() for _ in range(5)} == {'key-b'}
+    clock.now += 120
+    assert 'key-a' in {keys.acquire() for _ in range(5)}
+
+
+def test_refund_returns_the_budget(clock):
+    keys = pool([('key-a', 1)])
+    assert keys.acquire() == 'key-a'
+    keys.refund('key-a')
+    assert keys.acquire() == 'key-a'
+    assert keys.stats()['keys'][0]['calls'] == 1
+
+
+def test_bulk_calls_skip_keys_without_bulk_access(clock):
+    keys = pool([('key-a', 100), ('key-b', 100)])
+    keys.disable_bulk('key-a')
+    assert {keys.acquire(bulk=True) for _ in range(5)} == {'key-b'}
+    assert keys.acquire(cost=10) == 'key-a'
+    keys.disable_bulk('key-b')
+    assert not keys.bulk_available()
+    assert keys.acquire(bulk=True) is None
+
+
+def test_counts_and_quarantines_are_shared_through_the_file(clock, tmp_path):
+    path = str(tmp_path / 'keys.sqlite3')
+    keys = [('a1b2c3d4e5f60001', 10), ('a1b2c3d4e5f60002', 10)]
+    first = pool(keys, path=path, sync_interval=0)
+    second = pool(keys, path=path, sync_interval=0)
+    for _ in range(4):
+        first.acquire()
+    first.report('a1b2c3d4e5f60002', 401)
+    first.flush()
+    stats = {entry['key']: entry for entry in second.stats()['keys']}
+    assert sum(entry['calls'] for entry in stats.values()) == 4
+    assert stats[key_pool.mask_key('a1b2c3d4e5f60002')]['reason'] == 'http_401'
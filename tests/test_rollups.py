@@ -0,0 +1,90 @@
+import random
+import statistics
+
+import pytest
+
+from rollups import RunningStats, RollupTree
+
+
+def assert_matches(stats, values):
+    summary = stats.summary()
+    assert summary['count'] == len(values)
+    if not values:
+        assert summary['min'] is None and summary['max'] is None
+        return
+    assert summary['mean'] == pytest.approx(statistics.fmean(values), abs=1e-9)
+    assert summary['variance'] == pytest.approx(statistics.pvariance(values), abs=1e-7)
+    assert summary['min'] == min(values)
+    assert summary['max'] == max(values)
+
+
+def test_removal_undoes_addition():
+    stats = RunningStats()
+    for value in (12.5, -3.0, 7.25, 30.0):
+        stats.add(value)
+    stats.remove(30.0)
+    stats.remove(-3.0)
+    assert_matches(stats, [12.5, 7.25])
+
+
+def test_random_additions_and_removals_match_a_rescan():
+    rng = random.Random(7)
+    stats, values = RunningStats(), []
+    for _ in range(2000):
+        if values and rng.random() < 0.45:
+            stats.remove(values.pop(rng.randrange(len(values))))
+        else:
+            value = rng.choice([rng.randint(-5, 5), round(rng.uniform(-40, 45), 1)])
+            values.append(value)
+            stats.add(value)
+        assert_matches(stats, values)
+
+
+def test_duplicates_keep_min_and_max_until_the_last_copy_goes():
+    stats = RunningStats()
+    for value in (1.0, 1.0, 5.0):
+        stats.add(value)
+    stats.remove(1.0)
+    assert stats.summary()['min'] == 1.0
+    stats.remove(1.0)
+    assert stats.summary()['min'] == 5.0
+
+
+def test_removing_the_last_value_resets():
+    stats = RunningStats()
+    stats.add(4.0)
+    stats.remove(4.0)
+    assert_matches(stats, [])
+    stats.add(-2.0)
+    assert_matches(stats, [-2.0])
+
+
+def test_heaps_stay_bounded_under_churn():
+    stats = RunningStats()
+    for value in range(10):
+        stats.add(float(value))
+    for step in range(5000):
+        stats.remove(float(step))
+        stats.add(float(step + 10))
+    assert len(stats._low) <= 2 * stats.count + 32
+    assert stats.summary()['min'] == 5000.0
+    assert stats.summary()['max'] == 5009.0
+
+
+def test_tree_update_replaces_a_city_at_every_level():
+    tree = RollupTree()
+    tree.update('paris', 'FR', 'europe', 10.0, 50.0, 70.0, 'Rain')
+    tree.update('lyon', 'FR', 'europe', 14.0, 40.0, 60.0, 'Sunny')
+    tree.update('paris', 'FR', 'europe', 20.0, 30.0, 50.0, 'Sunny')
+
+    for level, key in (('global', 'all'), ('continent', 'europe'), ('country', 'FR')):
+        summary = tree.summary(level, key)
+        assert summary['count'] == 2
+        assert summary['temp']['mean'] == pytest.approx(17.0)
+        assert summary['temp']['min'] == 14.0
+        assert summary['conditions'] == {'Sunny': 2}
+
+    tree.discard('lyon')
+    tree.discard('paris')
+    assert tree.summary('country', 'FR') is None
+    assert tree.level('continent') == {}
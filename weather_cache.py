@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+
+DEFAULT_TTL = 540  # Seconds; just under the snapshot interval so each rebuild sees new data
+DEFAULT_MAXSIZE = 1024
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'enerwe-weather-cache.sqlite3')
+
+
+def cache_key(lat, lon):
+    """Normalise coordinates so equal cities always map to the same entry"""
+    return f"{round(float(lat), 4)},{round(float(lon), 4)}"
+
+
+class WeatherCache:
+    """TTL + LRU cache for weather observations keyed by (lat, lon).
+
+    Two tiers: an in-process OrderedDict that serves repeat reads without
+    any I/O, backed by a SQLite file that every gunicorn worker on the host
+    shares, so a city fetched by one worker is a hit for all the others.
+    Pass path=None to run with the in-process tier only. `dumps`/`loads`
+    convert values to and from the shared tier's text column; the
+    in-process tier keeps the objects themselves.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, maxsize=DEFAULT_MAXSIZE, path=DEFAULT_PATH, dumps=json.dumps, loads=json.loads):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.path = path
+        self.dumps = dumps
+        self.loads = loads
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    @classmethod
+    def from_env(cls, **codec):
+        """Build a cache configured from WEATHER_CACHE_* environment variables"""
+        path = os.getenv('WEATHER_CACHE_PATH', DEFAULT_PATH)
+        return cls(
+            ttl=float(os.getenv('WEATHER_CACHE_TTL', DEFAULT_TTL)),
+            maxsize=int(os.getenv('WEATHER_CACHE_MAXSIZE', DEFAULT_MAXSIZE)),
+            path=path or None,
+            **codec
+        )
+
+    # --- shared tier ---
+    def _shared(self):
+        # Connections must not cross a fork, so reopen per worker process
+        if self.path is None:
+            return None
+        if self._conn is None or self._conn_pid != os.getpid():
+            try:
+                conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS weather_cache ('
+                    'key TEXT PRIMARY KEY, expires_at REAL, accessed_at REAL, payload TEXT)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS weather_cache_lru ON weather_cache (accessed_at)')
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Weather cache disabled shared tier: {e}")
+                self.path = None
+                return None
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _shared_get(self, key, now):
+        conn = self._shared()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                'SELECT expires_at, payload FROM weather_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or row[0] <= now:
+                return None
+            value = self.loads(row[1])
+            conn.execute('UPDATE weather_cache SET accessed_at = ? WHERE key = ?', (now, key))
+            conn.commit()
+            return row[0], value
+        except sqlite3.Error as e:
+            print(f"Weather cache read error: {e}")
+            return None
+        except (ValueError, TypeError):
+            # Written by an older release with a different value format; refetch
+            return None
+
+    def _shared_set(self, key, value, expires_at, now):
+        conn = self._shared()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO weather_cache (key, expires_at, accessed_at, payload) '
+                'VALUES (?, ?, ?, ?)',
+                (key, expires_at, now, self.dumps(value))
+            )
+            conn.execute('DELETE FROM weather_cache WHERE expires_at <= ?', (now,))
+            conn.execute(
+                'DELETE FROM weather_cache WHERE key IN ('
+                'SELECT key FROM weather_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.maxsize,)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Weather cache write error: {e}")
+
+    # --- public API ---
+    def get(self, lat, lon):
+        """Return the cached observation for a location, or None on a miss"""
+        key = cache_key(lat, lon)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            shared = self._shared_get(key, now)
+            if shared is not None:
+                self._store_local(key, shared)
+                self.hits += 1
+                self.shared_hits += 1
+                return shared[1]
+
+            self.misses += 1
+            return None
+
+    def set(self, lat, lon, value):
+        """Store an observation in both tiers"""
+        key = cache_key(lat, lon)
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._store_local(key, (expires_at, value))
+            self._shared_set(key, value, expires_at, now)
+
+    def _store_local(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+            conn = self._shared()
+            if conn is not None:
+                conn.execute('DELETE FROM weather_cache')
+                conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this worker plus current sizing"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared_hits': self.shared_hits,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'shared': self.path is not None
+            }